@@ -0,0 +1,143 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from cachetools import TTLCache
+
+# Cache for KindWise analysis results, keyed by SHA-256 of the normalized
+# (compressed) image bytes. An in-memory LRU+TTL tier sits in front of an
+# optional on-disk tier, and concurrent requests for the same key share a
+# single upstream call (single-flight).
+
+
+class AnalysisCache:
+    def __init__(self, maxsize=1024, ttl=86400, disk_dir=None):
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "collapsed": 0, "uncacheable": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key_for(image_bytes):
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    def get_or_compute(self, key, compute, cacheable=lambda value: True):
+        """Return the cached value for `key`, or run `compute()` once for all concurrent callers."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._counters["hits"] += 1
+                return copy.deepcopy(value)
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._counters["collapsed"] += 1
+
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            value = self._disk_get(key)
+            if value is not None:
+                with self._lock:
+                    self._counters["disk_hits"] += 1
+                    self._memory[key] = value
+            else:
+                value = compute()
+                store = cacheable(value)
+                with self._lock:
+                    self._counters["misses"] += 1
+                    if store:
+                        self._memory[key] = value
+                    else:
+                        self._counters["uncacheable"] += 1
+                if store:
+                    self._disk_put(key, value)
+            future.set_result(value)
+            return copy.deepcopy(value)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def peek(self, key):
+        """Cached value or None, without computing; for callers that compute asynchronously."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._counters["hits"] += 1
+                return copy.deepcopy(value)
+        value = self._disk_get(key)
+        with self._lock:
+            if value is not None:
+                self._counters["disk_hits"] += 1
+                self._memory[key] = value
+            else:
+                self._counters["misses"] += 1
+        return copy.deepcopy(value) if value is not None else None
+
+    def store(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+        self._disk_put(key, value)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._memory)
+        lookups = counters["hits"] + counters["disk_hits"] + counters["misses"] + counters["collapsed"]
+        served = counters["hits"] + counters["disk_hits"] + counters["collapsed"]
+        return {
+            **counters,
+            "size": size,
+            "maxsize": self._memory.maxsize,
+            "ttl_seconds": self.ttl,
+            "disk_tier": bool(self.disk_dir),
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+        }
+
+    # ========== 💾 DISK TIER ==========
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if time.time() - entry.get("stored_at", 0) > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry.get("value")
+
+    def _disk_put(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": time.time(), "value": value}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            print(f"Error writing analysis cache entry {key}: {e}")
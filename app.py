@@ -1,18 +1,19 @@
-from flask import Flask
-from firebase_admin import credentials, initialize_app
-import firebase_admin
+import time
+_import_started = time.perf_counter()
+
+import os
+from flask import Flask, g, request
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Firebase initialization
-if not firebase_admin._apps:
-    cred = credentials.Certificate("./plantquest-8a4bd-firebase-adminsdk-fbsvc-ffc04c7186.json")
-    initialize_app(cred)
-
-
+# Firebase, Firestore, Gemini and KindWise are set up lazily by clients.py
+import clients
 from plant_routes import plant_routes
 from user_routes import user_bp
+from job_routes import job_bp
+from jobs import job_queue
+import eco_points
 
 app = Flask(__name__)
 
@@ -20,6 +21,44 @@ app = Flask(__name__)
 # Register blueprint
 app.register_blueprint(plant_routes)
 app.register_blueprint(user_bp)
+app.register_blueprint(job_bp)
+
+
+# First request per endpoint, which is where any lazy initialisation lands
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_first_request(response):
+    if request.endpoint and "request_started" in g:
+        clients.record("first_requests", request.endpoint, time.perf_counter() - g.request_started)
+    return response
+
+
+def start_services():
+    """Start the background threads of a serving process.
+
+    Not run on import: worker processes (video verification, the cold-start
+    benchmark) import this module too and must not pick up job workers, the
+    roll-up or a warm-up. Call it once from the server's start hook.
+    """
+    # Resume any registration jobs that were queued before a restart
+    job_queue.start()
+    # Folds sharded eco points into user totals and the leaderboards
+    eco_points.rollup.start()
+    # WARM_UP=background (default) builds the shared clients off the request
+    # path while the server starts taking traffic; WARM_UP=off leaves it to
+    # first use or POST /api/warm-up
+    if os.environ.get("WARM_UP", "background") == "background":
+        clients.warm_up_in_background()
+
+
+clients.record("imports", "app", time.perf_counter() - _import_started)
 
 if __name__ == '__main__':
+    # The reloader runs this file twice; only the serving child starts services
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_services()
     app.run(debug=True, host='0.0.0.0', port=5000)
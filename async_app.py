@@ -0,0 +1,48 @@
+import asyncio
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart
+from werkzeug.exceptions import HTTPException
+
+# ASGI entry point: the async routes run on the event loop, every other path
+# falls through to the regular Flask app (run in asgiref's thread pool), so
+# the API surface is identical to app.py.
+#
+#   hypercorn async_app:application --bind 0.0.0.0:5000
+
+from app import app as flask_app, start_services
+from async_routes import async_bp
+
+quart_app = Quart(__name__)
+quart_app.register_blueprint(async_bp)
+flask_asgi = WsgiToAsgi(flask_app)
+async_urls = quart_app.url_map.bind("localhost")
+
+
+@quart_app.before_serving
+async def start_background_services():
+    start_services()
+
+
+def served_async(scope):
+    try:
+        async_urls.match(scope["path"], method=scope["method"])
+        return True
+    except HTTPException:
+        return False
+
+
+async def application(scope, receive, send):
+    # Lifespan events start and stop the async clients
+    if scope["type"] == "lifespan" or (scope["type"] == "http" and served_async(scope)):
+        await quart_app(scope, receive, send)
+    else:
+        await flask_asgi(scope, receive, send)
+
+
+if __name__ == "__main__":
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = ["0.0.0.0:5000"]
+    asyncio.run(serve(application, config))
@@ -0,0 +1,199 @@
+import asyncio
+import base64
+import os
+import time
+import httpx
+from quart import Blueprint, request, jsonify
+from PIL import Image, UnidentifiedImageError
+
+import clients
+import outbound
+import quest_feed
+from outbound import OverloadedError
+from analysis_cache import AnalysisCache
+from plant_routes import (
+    plant_api, analysis_cache, KINDWISE_TIMEOUT, compress_image_bytes, is_complete_analysis,
+    summarize_identification, summarize_health, health_unavailable
+)
+from user_routes import nearby_plant_ids, parse_nearby_limit, NEARBY_QUEST_RADIUS_M
+
+# Async versions of the I/O-bound routes, served by async_app.py.
+# Firestore reads use the AsyncClient and KindWise is called over httpx, so a
+# request waiting on the network holds no thread; independent reads are
+# fanned out with asyncio.gather. Response bodies match the sync routes.
+
+async_bp = Blueprint("async_routes", __name__)
+adb = clients.async_db
+kindwise_plant = clients.lazy_import("kindwise.plant")
+# Firestore caps the values of an "in" filter
+IN_QUERY_LIMIT = 30
+kindwise_http = None
+
+
+@async_bp.before_app_serving
+async def open_http_clients():
+    global kindwise_http
+    kindwise_http = httpx.AsyncClient(
+        timeout=KINDWISE_TIMEOUT,
+        limits=httpx.Limits(max_connections=int(os.environ.get("KINDWISE_MAX_CONNECTIONS", 100)))
+    )
+
+
+@async_bp.after_app_serving
+async def close_http_clients():
+    if kindwise_http is not None:
+        await kindwise_http.aclose()
+
+
+# ========== 🌿 KINDWISE ==========
+async def kindwise_post(url, image_base64, details):
+    response = await kindwise_http.post(
+        url,
+        params={"details": ",".join(details)},
+        json={"images": [image_base64], "similar_images": True},
+        headers={"Api-Key": plant_api.api_key}
+    )
+    # HTTPStatusError carries the status, so the governor retries 429/5xx
+    response.raise_for_status()
+    return response.json()
+
+
+async def analyze_plant_async(image_bytes):
+    """analyze_plant_cached without threads; `image_bytes` must be the compressed image."""
+    key = AnalysisCache.key_for(image_bytes)
+    cached = analysis_cache.peek(key)
+    if cached is not None:
+        return cached
+
+    deadline = time.monotonic() + KINDWISE_TIMEOUT
+    image_base64 = base64.b64encode(image_bytes).decode("ascii")
+    identify = asyncio.ensure_future(outbound.acall(
+        "kindwise", kindwise_post, plant_api.identification_url, image_base64, ["url", "common_names"]))
+    health = asyncio.ensure_future(outbound.acall(
+        "kindwise", kindwise_post, plant_api.health_assessment_url, image_base64, ["description", "treatment"]))
+
+    try:
+        try:
+            identification = await asyncio.wait_for(identify, timeout=KINDWISE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TimeoutError("Plant identification timed out")
+
+        result = summarize_identification(kindwise_plant.PlantIdentification.from_dict(identification))
+        if not result["is_plant"]:
+            health.cancel()
+            return result
+
+        try:
+            assessment = await asyncio.wait_for(health, timeout=max(0, deadline - time.monotonic()))
+            result.update(summarize_health(kindwise_plant.HealthAssessment.from_dict(assessment)))
+        except Exception as e:
+            result.update(health_unavailable("Health assessment timed out" if isinstance(e, asyncio.TimeoutError) else str(e)))
+    except OverloadedError:
+        health.cancel()
+        raise
+    except Exception as e:
+        health.cancel()
+        return {"is_plant": False, "error": str(e)}
+
+    if is_complete_analysis(result):
+        analysis_cache.store(key, result)
+    return result
+
+
+@async_bp.route('/api/check-health', methods=['POST'])
+async def check_health():
+    data = await request.get_json()
+    image_path = data.get("image_path")
+
+    if not image_path or not os.path.exists(image_path):
+        return jsonify({"success": False, "error": "Invalid image path"}), 400
+
+    def read_and_compress():
+        with open(image_path, "rb") as f:
+            return compress_image_bytes(f.read())
+
+    try:
+        image_bytes = await asyncio.to_thread(read_and_compress)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        return jsonify({"success": False, "error": "File is not a readable image"}), 400
+
+    try:
+        analysis = await analyze_plant_async(image_bytes)
+    except OverloadedError as e:
+        return jsonify({"success": False, "error": "Plant analysis is busy, try again later.",
+                        "retry_after": e.retry_after}), 503, {"Retry-After": str(e.retry_after)}
+    if not analysis.get("is_plant", False):
+        return jsonify({"success": False, "error": analysis.get("error", "Not a valid plant image")}), 400
+
+    return jsonify({"success": True, "analysis": analysis})
+
+
+# ========== 🔍 QUESTS ==========
+async def pending_quests_for(plant_ids):
+    query = adb.collection("Quests") \
+        .where("plant_id", "in", plant_ids) \
+        .where("status", "==", "pending")
+    return [doc async for doc in query.stream()]
+
+
+@async_bp.route("/quests/nearby", methods=["POST"])
+async def get_nearby_quests():
+    data = await request.get_json()
+    lat = data.get("lat")
+    lng = data.get("lng")
+
+    try:
+        limit = parse_nearby_limit(data.get("limit"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if lat is None or lng is None:
+        return jsonify({"error": "Missing coordinates"}), 400
+
+    # In-memory when the coordinate cache is ready; its Firestore fallback is
+    # synchronous, so it runs off the event loop
+    plant_ids = await asyncio.to_thread(nearby_plant_ids, lat, lng, NEARBY_QUEST_RADIUS_M, limit)
+
+    # One query per chunk of plants instead of one per plant, all in flight at once
+    chunks = [plant_ids[i:i + IN_QUERY_LIMIT] for i in range(0, len(plant_ids), IN_QUERY_LIMIT)]
+    results = await asyncio.gather(*(pending_quests_for(chunk) for chunk in chunks))
+
+    by_plant = {}
+    for docs in results:
+        for q in docs:
+            quest = q.to_dict()
+            quest["id"] = q.id
+            by_plant.setdefault(quest.get("plant_id"), []).append(quest)
+
+    # Nearest plants first, as in the sync route
+    quests = [quest for plant_id in plant_ids for quest in by_plant.get(plant_id, [])]
+    return jsonify({"nearby_quests": quests})
+
+
+@async_bp.route("/user/quests", methods=["GET"])
+async def view_user_quests():
+    user_id = request.args.get("user_id")
+    status = request.args.get("status", "pending")
+
+    if not user_id:
+        return jsonify({"error": "Missing user_id"}), 400
+    try:
+        after, limit, fields = quest_feed.page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    feed_doc = await quest_feed.feed_ref(adb, user_id).get()
+    feed = feed_doc.to_dict() if feed_doc.exists else None
+    if feed and feed.get("complete"):
+        feed_quests = feed.get("quests") or {}
+    else:
+        # One-off rebuild from Quests; it is a sync transaction, so off the event loop
+        feed_quests = await asyncio.to_thread(quest_feed.load_feed, clients.db, user_id)
+    quests, next_cursor = quest_feed.page(feed_quests, status, after, limit, fields)
+
+    extra = quest_feed.missing_fields(fields)
+    if extra and quests:
+        refs = [adb.collection("Quests").document(q["id"]) for q in quests]
+        quest_feed.fill_fields(quests, extra, [doc async for doc in adb.get_all(refs, field_paths=extra)])
+
+    return jsonify({"quests": quests, "next_cursor": next_cursor})
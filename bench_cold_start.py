@@ -0,0 +1,150 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# Cold-start report for the Flask app.
+# Each run imports app.py in a fresh process (importing starts no warm-up or
+# background services), then sends the given requests through the test client, so the timings include whatever
+# lazy initialisation the first request to each endpoint triggers. It also
+# records which heavy modules the import pulled in (there should be none) and
+# the slowest imports from `python -X importtime`. With --max-import-ms the
+# script exits non-zero on a regression, so it can gate CI.
+#
+#   python bench_cold_start.py --runs 5 --max-import-ms 400
+#   python bench_cold_start.py --requests "GET /api/outbound/stats" \
+#       'POST /api/check-health {"image_path": "img1.jpg"}'
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Must stay out of the import path of app.py; clients.py loads them on demand
+HEAVY_MODULES = ("google.generativeai", "google.cloud.firestore", "kindwise", "imagehash", "geopy", "cv2")
+DEFAULT_REQUESTS = ("GET /api/outbound/stats", "GET /api/startup/stats")
+
+
+def parse_request(spec):
+    """'POST /path {"a": 1}' -> ("POST", "/path", {"a": 1})"""
+    parts = spec.split(None, 2)
+    if len(parts) < 2:
+        raise argparse.ArgumentTypeError(f"Expected 'METHOD PATH [JSON]', got {spec!r}")
+    return parts[0].upper(), parts[1], json.loads(parts[2]) if len(parts) == 3 else None
+
+
+def _cold_start(requests, warm_up):
+    os.chdir(HERE)
+    sys.path.insert(0, HERE)
+
+    started = time.perf_counter()
+    import app
+    import_ms = (time.perf_counter() - started) * 1000
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    import clients
+    warm_up_ms = None
+    if warm_up:
+        started = time.perf_counter()
+        clients.warm_up()
+        warm_up_ms = (time.perf_counter() - started) * 1000
+
+    client = app.app.test_client()
+    responses = []
+    for method, path, body in requests:
+        started = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        responses.append({
+            "request": f"{method} {path}",
+            "status": response.status_code,
+            "ms": round((time.perf_counter() - started) * 1000, 2),
+        })
+    return {
+        "import_ms": round(import_ms, 2),
+        "warm_up_ms": round(warm_up_ms, 2) if warm_up_ms is not None else None,
+        "heavy_modules_loaded": loaded,
+        "requests": responses,
+        "startup": clients.startup_report(),
+    }
+
+
+def cold_start(requests, warm_up):
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes=1, maxtasksperchild=1) as pool:
+        return pool.apply(_cold_start, (requests, warm_up))
+
+
+def import_profile(top=15):
+    """Slowest modules (cumulative time) when importing app.py."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=HERE,
+                            capture_output=True, text=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        fields = line.partition("import time:")[2].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        modules.append((int(fields[1]), fields[2].strip()))
+    modules.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 2)} for us, name in modules[:top]]
+
+
+def median_of(runs, pick):
+    values = [pick(run) for run in runs if pick(run) is not None]
+    return round(statistics.median(values), 2) if values else None
+
+
+def run(args):
+    runs = [cold_start(args.requests, args.warm_up) for _ in range(args.runs)]
+    summary = {
+        "import_ms": median_of(runs, lambda r: r["import_ms"]),
+        "warm_up_ms": median_of(runs, lambda r: r["warm_up_ms"]),
+        "first_request_ms": {
+            f"{method} {path}": median_of(runs, lambda r, i=i: r["requests"][i]["ms"])
+            for i, (method, path, _) in enumerate(args.requests)
+        },
+        "heavy_modules_loaded": sorted({name for r in runs for name in r["heavy_modules_loaded"]}),
+    }
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+            "warm_up": args.warm_up,
+        },
+        "summary": summary,
+        "slowest_imports": import_profile(),
+        "runs": runs,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure app import time and first-request latency")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--requests", nargs="+", type=parse_request,
+                        default=[parse_request(spec) for spec in DEFAULT_REQUESTS])
+    parser.add_argument("--warm-up", action="store_true", help="Run clients.warm_up() before the requests")
+    parser.add_argument("--max-import-ms", type=float, help="Fail if the median import time is above this")
+    parser.add_argument("--output", default="bench_results/cold_start.json")
+    args = parser.parse_args()
+
+    report = run(args)
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps({**report["summary"], "slowest_imports": report["slowest_imports"][:5]}, indent=2))
+    print(f"Results written to {args.output}")
+
+    failures = []
+    if report["summary"]["heavy_modules_loaded"]:
+        failures.append(f"heavy modules imported with the app: {', '.join(report['summary']['heavy_modules_loaded'])}")
+    if args.max_import_ms is not None and report["summary"]["import_ms"] > args.max_import_ms:
+        failures.append(f"median import {report['summary']['import_ms']}ms > {args.max_import_ms}ms")
+    if failures:
+        print("Cold start regression: " + "; ".join(failures))
+        sys.exit(1)
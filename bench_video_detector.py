@@ -0,0 +1,234 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+# Benchmark for the video plant detector in check.py.
+# Generates deterministic synthetic videos with cv2.VideoWriter, runs each
+# detector entry point on each video in a fresh process, and writes
+# throughput, peak RSS and decision correctness as JSON so results can be
+# diffed between releases. "fps" is source video frames covered per second
+# of wall time, so early stopping and skipped frames count in its favour.
+#
+#   python bench_video_detector.py --output bench_results/video_detector.json
+#   python bench_video_detector.py --resolutions 2160p --durations 60 --scenarios green_moving_sharp
+
+RESOLUTIONS = {
+    "480p": (854, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "2160p": (3840, 2160),
+}
+CODECS = {
+    "mp4v": ".mp4",
+    "MJPG": ".avi",
+    "XVID": ".avi",
+}
+# Every combination of green/plain, moving/static and sharp/blurry; only a
+# moving, sharp, green scene should be accepted
+SCENARIOS = {
+    f"{colour}_{motion}_{focus}": {
+        "green": colour == "green",
+        "moving": motion == "moving",
+        "blurry": focus == "blurry",
+    }
+    for colour, motion, focus in itertools.product(("green", "plain"), ("moving", "static"), ("sharp", "blurry"))
+}
+OPERATIONS = ("video_contains_plant", "best_plant_frame", "extract_frames", "save_first_frame")
+FPS = 30
+SEED = 1234
+
+
+# ========== 🎞️ SYNTHETIC VIDEOS ==========
+def make_scene(width, height, green, blurry, seed=SEED):
+    rng = np.random.default_rng(seed)
+    # Blocky grey-brown texture: sharp edges, no green hues
+    cell = max(4, width // 160)
+    noise = rng.integers(0, 256, (height // cell + 1, width // cell + 1), dtype=np.uint8)
+    texture = cv2.resize(noise, None, fx=cell, fy=cell, interpolation=cv2.INTER_NEAREST)[:height, :width]
+    texture = texture.astype(np.float32)
+    scene = np.dstack([texture * 0.5 + 50, texture * 0.5 + 55, texture * 0.5 + 65])
+
+    if green:
+        # A handful of textured "leaves"
+        mask = np.zeros((height, width), np.uint8)
+        for _ in range(6):
+            center = (int(rng.integers(width // 5, 4 * width // 5)), int(rng.integers(height // 5, 4 * height // 5)))
+            cv2.ellipse(mask, center, (width // 10, height // 14), float(rng.integers(0, 180)), 0, 360, 255, -1)
+        leaf = np.dstack([texture * 0.2 + 20, texture * 0.5 + 90, texture * 0.2 + 30])
+        scene[mask > 0] = leaf[mask > 0]
+
+    scene = np.clip(scene, 0, 255).astype(np.uint8)
+    if blurry:
+        scene = cv2.GaussianBlur(scene, (0, 0), width / 120)
+    return scene
+
+
+def write_video(path, codec, resolution, duration, scenario):
+    width, height = RESOLUTIONS[resolution]
+    spec = SCENARIOS[scenario]
+    scene = make_scene(width, height, spec["green"], spec["blurry"])
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), FPS, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Codec {codec} is not available in this OpenCV build")
+    step = max(1, width // 320)
+    frames = int(duration * FPS)
+    for i in range(frames):
+        writer.write(np.roll(scene, i * step, axis=1) if spec["moving"] else scene)
+    writer.release()
+    return frames
+
+
+# ========== ⏱️ MEASUREMENT ==========
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_operation(operation, video_path, workdir):
+    import check
+    baseline_rss = _peak_rss_mb()
+    started = time.perf_counter()
+    decision = None
+    if operation == "video_contains_plant":
+        decision = check.video_contains_plant(video_path)
+    elif operation == "best_plant_frame":
+        decision = check.best_plant_frame(video_path) is not None
+    elif operation == "extract_frames":
+        check.extract_frames(video_path)
+    elif operation == "save_first_frame":
+        check.save_first_frame(video_path, os.path.join(workdir, f"first_frame_{os.getpid()}.jpg"))
+    seconds = time.perf_counter() - started
+    return {"seconds": seconds, "decision": decision, "baseline_rss_mb": baseline_rss, "peak_rss_mb": _peak_rss_mb()}
+
+
+def measure(operation, video_path, workdir):
+    # A fresh process per measurement so peak RSS belongs to this operation alone
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes=1, maxtasksperchild=1) as pool:
+        return pool.apply(_run_operation, (operation, video_path, workdir))
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_video_")
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    try:
+        for resolution, duration, codec, scenario in itertools.product(
+                args.resolutions, args.durations, args.codecs, args.scenarios):
+            name = f"{scenario}_{resolution}_{duration:g}s_{codec}"
+            path = os.path.join(workdir, name + CODECS[codec])
+            try:
+                frames = write_video(path, codec, resolution, duration, scenario)
+            except RuntimeError as e:
+                print(f"Skipping {name}: {e}")
+                continue
+            spec = SCENARIOS[scenario]
+            expected = spec["green"] and spec["moving"] and not spec["blurry"]
+
+            for operation in args.ops:
+                measured = measure(operation, path, workdir)
+                entry = {
+                    "video": name,
+                    "scenario": scenario,
+                    "resolution": resolution,
+                    "duration_seconds": duration,
+                    "codec": codec,
+                    "frames": frames,
+                    "size_bytes": os.path.getsize(path),
+                    "operation": operation,
+                    "seconds": round(measured["seconds"], 4),
+                    "fps": round(frames / measured["seconds"], 1) if measured["seconds"] > 0 else None,
+                    "peak_rss_mb": measured["peak_rss_mb"],
+                    "rss_delta_mb": (round(measured["peak_rss_mb"] - measured["baseline_rss_mb"], 1)
+                                     if measured["peak_rss_mb"] is not None else None),
+                }
+                if measured["decision"] is not None:
+                    entry["decision"] = measured["decision"]
+                    entry["expected"] = expected
+                    entry["correct"] = measured["decision"] == expected
+                results.append(entry)
+                print(f"{name:45} {operation:22} {entry['seconds']:8.3f}s {entry['fps'] or 0:9.1f} fps "
+                      f"{entry['peak_rss_mb'] or 0:8.1f} MB" + ("" if "correct" not in entry else
+                                                             f"  {'ok' if entry['correct'] else 'WRONG'}"))
+            if not args.keep_videos:
+                os.remove(path)
+    finally:
+        if not args.keep_videos and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    decisions = [r for r in results if "correct" in r]
+    summary = {}
+    for operation in args.ops:
+        timings = [r for r in results if r["operation"] == operation]
+        if not timings:
+            continue
+        summary[operation] = {
+            "runs": len(timings),
+            "mean_fps": round(sum(r["fps"] for r in timings) / len(timings), 1),
+            "max_peak_rss_mb": max((r["peak_rss_mb"] or 0) for r in timings),
+        }
+        judged = [r for r in decisions if r["operation"] == operation]
+        if judged:
+            summary[operation]["accuracy"] = round(sum(r["correct"] for r in judged) / len(judged), 4)
+
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "seed": SEED,
+            "fps": FPS,
+        },
+        "summary": summary,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark check.py on synthetic videos")
+    parser.add_argument("--resolutions", nargs="+", default=["480p", "1080p"], choices=list(RESOLUTIONS))
+    parser.add_argument("--durations", nargs="+", type=float, default=[5.0], help="Video lengths in seconds")
+    parser.add_argument("--codecs", nargs="+", default=["mp4v", "MJPG"], choices=list(CODECS))
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--ops", nargs="+", default=list(OPERATIONS), choices=list(OPERATIONS))
+    parser.add_argument("--output", default="bench_results/video_detector.json")
+    parser.add_argument("--workdir", help="Where to write the generated videos (default: a temp dir)")
+    parser.add_argument("--keep-videos", action="store_true")
+    args = parser.parse_args()
+
+    report = run(args)
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["summary"], indent=2))
+    print(f"Results written to {args.output}")
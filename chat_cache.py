@@ -0,0 +1,72 @@
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from cachetools import LRUCache
+
+# Cache of chatbot answers, keyed on what the answer depends on: a fingerprint
+# of the plant fields that make up the persona and a normalized form of the
+# question. When any of those fields change the fingerprint changes, so stale
+# answers are simply never looked up again and age out of the LRU. The cache
+# is bounded by the total size of the stored answers, not by entry count.
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question):
+    """'  Do I need WATER?? ' -> 'do i need water'"""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def plant_fingerprint(plant_data, fields):
+    values = {field: plant_data.get(field) for field in fields}
+    encoded = json.dumps(values, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ChatAnswerCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._answers = LRUCache(maxsize=max_bytes, getsizeof=self._size)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def _size(answer):
+        # Approximate footprint: the UTF-8 answer plus the key and entry overhead
+        return len(answer.encode("utf-8")) + 200
+
+    @staticmethod
+    def key_for(fingerprint, question):
+        return hashlib.sha256(f"{fingerprint}\n{normalize_question(question)}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            answer = self._answers.get(key)
+            self._counters["hits" if answer is not None else "misses"] += 1
+            return answer
+
+    def put(self, key, answer):
+        if not answer or self._size(answer) > self.max_bytes:
+            return
+        with self._lock:
+            self._answers[key] = answer
+            self._counters["stores"] += 1
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            entries = len(self._answers)
+            used = self._answers.currsize
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "entries": entries,
+            "bytes": used,
+            "max_bytes": self.max_bytes,
+            "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+        }
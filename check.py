@@ -2,28 +2,70 @@ import cv2
 import os
 import numpy as np
 
-def extract_frames(video_path, interval=30):
+# Sampled frames are downscaled to at most this width; the green-pixel
+# threshold is applied as a ratio of the frame so decisions stay comparable
+SAMPLE_MAX_WIDTH = 640
+# Sampled frames are scored this many at a time; small enough that early
+# stopping still skips most of the decode work
+ANALYSIS_BATCH_SIZE = 4
+LOWER_GREEN = np.array([25, 40, 40])
+UPPER_GREEN = np.array([95, 255, 255])
+
+def iter_frames(video_path, interval=30, max_width=SAMPLE_MAX_WIDTH):
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         raise ValueError("Could not open video file")
 
-    frames = []
-    frame_count = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        if frame_count % interval == 0:
-            frames.append(frame)
-        frame_count += 1
-    cap.release()
-    return frames
+    try:
+        frame_index = 0
+        while True:
+            # grab() only advances the stream; skipped frames are never
+            # converted to BGR or copied into Python
+            if not cap.grab():
+                break
+            if frame_index % interval == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                yield downscale_frame(frame, max_width)
+            frame_index += 1
+    finally:
+        cap.release()
+
+def downscale_frame(frame, max_width=SAMPLE_MAX_WIDTH):
+    height, width = frame.shape[:2]
+    if not max_width or width <= max_width:
+        return frame
+    scale = max_width / width
+    return cv2.resize(frame, (max_width, max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+
+def count_is_exact(cap, total):
+    # CAP_PROP_FRAME_COUNT is often estimated from duration x fps. Trust it
+    # only if the claimed last frame exists and nothing follows it
+    if total <= 0 or not cap.set(cv2.CAP_PROP_POS_FRAMES, total - 1) or not cap.grab():
+        return False
+    return int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == total and not cap.grab()
+
+def sample_count(video_path, interval=30):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError("Could not open video file")
+    try:
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        trusted = count_is_exact(cap, total)
+    finally:
+        cap.release()
+    samples = (total + interval - 1) // interval if total > 0 else None
+    return samples, (width, height), trusted
+
+def extract_frames(video_path, interval=30, max_width=SAMPLE_MAX_WIDTH):
+    return list(iter_frames(video_path, interval, max_width))
 
 def is_plant_present(frame, green_threshold=300):
     hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    lower_green = np.array([25, 40, 40])
-    upper_green = np.array([95, 255, 255])
-    mask = cv2.inRange(hsv, lower_green, upper_green)
+    mask = cv2.inRange(hsv, LOWER_GREEN, UPPER_GREEN)
     green_pixels = cv2.countNonZero(mask)
     return green_pixels > green_threshold
 
@@ -48,27 +90,136 @@ def detect_low_motion(frames, diff_threshold=3):
     avg_diff = np.mean(differences)
     return avg_diff < diff_threshold
 
-def video_contains_plant(video_path, interval=30, confidence_threshold=0.3):
-    try:
-        frames = extract_frames(video_path, interval)
-        if not frames:
-            return False
+def iter_batches(frames, batch_size=ANALYSIS_BATCH_SIZE):
+    batch = []
+    for frame in frames:
+        if batch and frame.shape != batch[0].shape:
+            yield np.stack(batch)
+            batch = []
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield np.stack(batch)
+            batch = []
+    if batch:
+        yield np.stack(batch)
+
+def analyze_frames(batch, prev_gray=None):
+    """Score a (N, H, W, 3) stack of BGR frames in one pass.
 
-        plant_frames = 0
-        for frame in frames:
-            if not is_plant_present(frame):
-                continue
-            if is_frame_blurry(frame):
-                continue
-            plant_frames += 1
+    Returns (scores, last_gray): per-frame green ratio, Laplacian variance and
+    mean absolute difference from the previous frame (NaN for the first
+    frame of a video), plus the last grayscale frame to chain batches.
+    """
+    n, height, width = batch.shape[:3]
+    # Colour conversions are per-pixel, so the stack is converted as one tall image
+    flat = batch.reshape(n * height, width, 3)
+    mask = cv2.inRange(cv2.cvtColor(flat, cv2.COLOR_BGR2HSV), LOWER_GREEN, UPPER_GREEN).reshape(n, height, width)
+    gray = cv2.cvtColor(flat, cv2.COLOR_BGR2GRAY).reshape(n, height, width)
 
-        confidence = plant_frames / len(frames)
+    green_ratio = np.array([cv2.countNonZero(m) for m in mask]) / (height * width)
+    # 16-bit Laplacian is exact for 8-bit input and about twice as fast as CV_64F
+    sharpness = np.array([cv2.meanStdDev(cv2.Laplacian(g, cv2.CV_16S))[1][0, 0] ** 2 for g in gray])
 
+    # One grayscale per frame, shared by consecutive pairs (and across batches)
+    if prev_gray is not None and prev_gray.shape == gray.shape[1:]:
+        motion_gray = np.concatenate([prev_gray[None], gray])
+        motion = []
+    else:
+        motion_gray = gray
+        motion = [np.nan]
+    if len(motion_gray) > 1:
+        diff = cv2.absdiff(motion_gray[1:].reshape(-1, width), motion_gray[:-1].reshape(-1, width))
+        motion += [cv2.mean(d)[0] for d in diff.reshape(-1, height, width)]
+
+    scores = {"green_ratio": green_ratio, "sharpness": sharpness, "motion": np.array(motion, dtype=np.float64)}
+    return scores, gray[-1]
+
+def early_decision(plant_frames, diff_total, samples, expected, confidence_threshold=0.3, diff_threshold=3):
+    # Verdict from a partial scan of a video with `expected` samples, or
+    # None if the remaining samples could still change it
+    if not expected or samples >= expected:
+        return None
+    needed = confidence_threshold * expected
+    # Even if every remaining sample had a plant, confidence stays too low
+    if plant_frames + (expected - samples) < needed:
+        return False
+    # Confidence is reached and the motion sum already exceeds the
+    # low-motion bar for all pairs (remaining differences are >= 0)
+    if plant_frames >= needed and diff_total >= diff_threshold * (expected - 1):
+        return True
+    return None
+
+def verify_video(video_path, interval=30, confidence_threshold=0.3, diff_threshold=3,
+                 blur_threshold=50, green_threshold=300, keep_best=False):
+    # Expected sample count from the container; None means unknown. Only a
+    # verified count may stop the scan early, otherwise the whole video is scanned
+    expected, (source_width, source_height), trusted = sample_count(video_path, interval)
+    # green_threshold is in source pixels; as a ratio it is resolution independent
+    source_area = source_width * source_height
+    min_green_ratio = green_threshold / source_area if source_area > 0 else 0.0
+
+    frames = []
+    plant_frames = 0
+    diff_total = 0.0
+    prev_gray = None
+    decision = None
+    # Best candidate so far: plant frames first, then sharpness x greenness.
+    # Only one frame is kept, so memory stays bounded
+    best_key = None
+    best_frame = None
+    best_index = None
+    for batch in iter_batches(iter_frames(video_path, interval)):
+        if source_area <= 0:
+            min_green_ratio = green_threshold / (batch.shape[1] * batch.shape[2])
+        scores, prev_gray = analyze_frames(batch, prev_gray)
+        plant = (scores["green_ratio"] > min_green_ratio) & (scores["sharpness"] >= blur_threshold)
+        plant_frames += int(plant.sum())
+        diff_total += float(np.nansum(scores["motion"]))
+        for i in range(len(batch)):
+            if keep_best:
+                key = (bool(plant[i]), float(scores["green_ratio"][i] * scores["sharpness"][i]))
+                if best_key is None or key > best_key:
+                    best_key, best_frame, best_index = key, batch[i].copy(), len(frames) * interval
+            frames.append({
+                "index": len(frames) * interval,
+                "green_ratio": round(float(scores["green_ratio"][i]), 4),
+                "sharpness": round(float(scores["sharpness"][i]), 2),
+                "motion": None if np.isnan(scores["motion"][i]) else round(float(scores["motion"][i]), 3),
+                "plant": bool(plant[i]),
+            })
+
+        if trusted:
+            decision = early_decision(plant_frames, diff_total, len(frames), expected,
+                                      confidence_threshold, diff_threshold)
+            if decision is not None:
+                break
+
+    stopped_early = decision is not None
+    samples = len(frames)
+    confidence = plant_frames / samples if samples else 0.0
+    avg_motion = diff_total / (samples - 1) if samples > 1 else 0.0
+    if decision is None:
         # Add motion check: if almost no motion, it's likely a screen video
-        is_low_motion = detect_low_motion(frames)
+        is_low_motion = samples < 2 or avg_motion < diff_threshold
+        decision = samples > 0 and confidence >= confidence_threshold and not is_low_motion
 
-        return confidence >= confidence_threshold and not is_low_motion
+    result = {
+        "contains_plant": decision,
+        "confidence": round(confidence, 4),
+        "avg_motion": round(avg_motion, 3),
+        "samples": samples,
+        "expected_samples": expected,
+        "stopped_early": stopped_early,
+        "frames": frames,
+    }
+    if keep_best:
+        result["best_frame"] = best_frame
+        result["best_frame_index"] = best_index
+    return result
 
+def video_contains_plant(video_path, interval=30, confidence_threshold=0.3):
+    try:
+        return verify_video(video_path, interval, confidence_threshold)["contains_plant"]
     except Exception as e:
         print(f"Error processing video: {str(e)}")
         return False
@@ -97,3 +248,22 @@ def save_first_frame(video_path, output_path=None, format="jpg"):
         raise ValueError(f"Failed to save image to {output_path}")
 
     return output_path
+
+def encode_jpeg(frame, quality=90):
+    success, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not success:
+        raise ValueError("Failed to encode frame")
+    return encoded.tobytes()
+
+def best_plant_frame(video_path, interval=30, confidence_threshold=0.3, quality=90):
+    # Verification and frame selection in one decode pass: returns the
+    # sharpest, greenest sampled frame as JPEG bytes, or None if the video
+    # does not show a plant
+    try:
+        result = verify_video(video_path, interval, confidence_threshold, keep_best=True)
+        if not result["contains_plant"] or result["best_frame"] is None:
+            return None
+        return encode_jpeg(result["best_frame"], quality)
+    except Exception as e:
+        print(f"Error processing video: {str(e)}")
+        return None
@@ -0,0 +1,165 @@
+import importlib
+import os
+import threading
+import time
+
+# Shared clients and heavy dependencies, created on first use.
+# Importing the app only declares them: the Firebase app, the Firestore
+# clients, Gemini and KindWise are built the first time something touches
+# them, or all at once by warm_up(). Importing never warms up: the server's
+# start hook (app.start_services) runs it in the background, and POST
+# /api/warm-up runs it on demand. Every import and initialisation is
+# timed together with the first request to each endpoint, so startup_report()
+# shows where a cold start spends its time.
+
+FIREBASE_CREDENTIALS = os.environ.get("FIREBASE_CREDENTIALS",
+                                      "./plantquest-8a4bd-firebase-adminsdk-fbsvc-ffc04c7186.json")
+KINDWISE_TIMEOUT = float(os.environ.get("KINDWISE_TIMEOUT", 30))
+
+registry = {}
+_timings_lock = threading.Lock()
+_timings = {"imports": {}, "init": {}, "first_requests": {}, "errors": {}}
+
+
+def record(kind, name, seconds):
+    """Keep the first timing reported for `name`; later ones are warm and not interesting."""
+    with _timings_lock:
+        _timings[kind].setdefault(name, round(seconds * 1000, 2))
+
+
+class Lazy:
+    """Builds its value on first use and then stands in for it (attribute access is forwarded)."""
+
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+        self._value = None
+        self._ready = False
+        self._lock = threading.Lock()
+        registry[name] = self
+
+    @property
+    def ready(self):
+        return self._ready
+
+    def get(self):
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    started = time.perf_counter()
+                    try:
+                        self._value = self._factory()
+                    except Exception as e:
+                        # Not cached: the next use tries again
+                        with _timings_lock:
+                            _timings["errors"][self._name] = str(e)
+                        raise
+                    self._ready = True
+                    record("init", self._name, time.perf_counter() - started)
+                    with _timings_lock:
+                        _timings["errors"].pop(self._name, None)
+        return self._value
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+    def __repr__(self):
+        return f"<Lazy {self._name} {'ready' if self._ready else 'pending'}>"
+
+
+def lazy(name, factory):
+    return Lazy(name, factory)
+
+
+def lazy_import(module_name):
+    return Lazy(module_name, lambda: importlib.import_module(module_name))
+
+
+# ========== 🔥 FIREBASE ==========
+def _init_firebase():
+    import firebase_admin
+    from firebase_admin import credentials
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
+    return firebase_admin.initialize_app(credentials.Certificate(FIREBASE_CREDENTIALS))
+
+
+def _firestore_client():
+    firebase_app.get()
+    return firestore.client()
+
+
+def _firestore_async_client():
+    firebase_app.get()
+    return firestore_async.client()
+
+
+firebase_app = lazy("firebase_app", _init_firebase)
+firestore = lazy_import("firebase_admin.firestore")
+firestore_async = lazy_import("firebase_admin.firestore_async")
+db = lazy("firestore_client", _firestore_client)
+async_db = lazy("firestore_async_client", _firestore_async_client)
+
+
+# ========== 🤖 GEMINI / KINDWISE ==========
+def _init_genai():
+    import google.generativeai as genai
+    genai.configure(api_key=os.environ.get("GEMINI_API"))
+    return genai
+
+
+def _plant_api():
+    import requests
+    from kindwise import PlantApi
+
+    class TimedPlantApi(PlantApi):
+        # kindwise calls requests.request() with no timeout, so a hung
+        # connection would hold an outbound slot forever; requests' Timeout
+        # errors are retried with backoff by the governor like a 5xx
+        session = requests.Session()
+
+        def _make_api_call(self, url, method, data=None):
+            headers = {
+                "Content-Type": "application/json",
+                "Api-Key": self.api_key,
+            }
+            response = self.session.request(method, url, json=data, headers=headers, timeout=KINDWISE_TIMEOUT)
+            if not response.ok:
+                raise ValueError(f"Error while making an API call: {response.status_code=} {response.text=}")
+            return response
+
+    api = TimedPlantApi(os.environ.get("PLANT_API"))
+    if os.environ.get("PLANT_API_HOST"):
+        # e.g. http://localhost:5001 to run against kindwise_stub.py
+        api.host = os.environ["PLANT_API_HOST"]
+    return api
+
+
+genai = lazy("gemini", _init_genai)
+plant_api = lazy("plant_api", _plant_api)
+
+
+# ========== ⏱️ WARM-UP / REPORT ==========
+def warm_up(names=None):
+    """Build the named singletons (default: all of them); returns {name: error} for those that failed."""
+    failed = {}
+    for name in names or list(registry):
+        try:
+            registry[name].get()
+        except Exception as e:
+            failed[name] = str(e)
+    return failed
+
+
+def warm_up_in_background(names=None):
+    thread = threading.Thread(target=warm_up, args=(names,), name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def startup_report():
+    with _timings_lock:
+        report = {kind: dict(values) for kind, values in _timings.items()}
+    report["ready"] = sorted(name for name, value in registry.items() if value.ready)
+    report["pending"] = sorted(name for name, value in registry.items() if not value.ready)
+    return report
@@ -0,0 +1,296 @@
+import os
+import random
+import threading
+import time
+
+import geo_index
+from clients import db, firestore
+
+# Sharded eco-point counters and incrementally maintained leaderboards.
+# Awards never write the user document: each one increments a random shard in
+# EcoPointShards (one document per user and shard), together with the plant or
+# quest it was for, so a burst of awards to a single account is spread over
+# ECO_POINTS_SHARDS documents. A background roll-up folds dirty shards into
+# Users (eco_points, added_plants, quests_completed) and merges the new totals
+# into the top-N leaderboard documents (global, and one per geohash area) in
+# the same transaction, a chunk of users at a time. Points only ever go up, so
+# merging changed users into the top LEADERBOARD_SIZE entries of a board keeps
+# it exact as long as nobody leaves it. When a user moves out of an area whose
+# board is full, that board is re-read from Users (leaderboard_area,
+# eco_points) in the same transaction, so the next user in line moves up.
+
+SHARDS_COLLECTION = "EcoPointShards"
+LEADERBOARDS_COLLECTION = "Leaderboards"
+ECO_POINTS_SHARDS = int(os.environ.get("ECO_POINTS_SHARDS", 10))
+ECO_POINTS_ROLLUP_SECONDS = float(os.environ.get("ECO_POINTS_ROLLUP_SECONDS", 10))
+LEADERBOARD_SIZE = int(os.environ.get("LEADERBOARD_SIZE", 100))
+# Geohash length of a leaderboard area; 4 is roughly 40 x 20 km
+LEADERBOARD_AREA_PRECISION = int(os.environ.get("LEADERBOARD_AREA_PRECISION", 4))
+GLOBAL_BOARD = "global"
+# Users folded per transaction: an "in" query takes at most 30 values, and
+# shards, users and boards together stay well under 500 writes
+ROLLUP_USERS_PER_TRANSACTION = 20
+
+
+def award(writer, user_id, points, added_plants=(), quests_completed=()):
+    """Add `points` (and the plants/quests they were for) to one of the user's shards through `writer`.
+
+    `writer` is a transaction or a batch; the roll-up moves it all onto the user document.
+    """
+    update = {}
+    if points:
+        update["points"] = firestore.Increment(points)
+    if added_plants:
+        update["added_plants"] = firestore.ArrayUnion(list(added_plants))
+    if quests_completed:
+        update["quests_completed"] = firestore.ArrayUnion(list(quests_completed))
+    if not update:
+        return
+    shard = random.randrange(ECO_POINTS_SHARDS)
+    writer.set(db.collection(SHARDS_COLLECTION).document(f"{user_id}_{shard}"), {
+        "user_id": user_id,
+        "dirty": True,
+        **update
+    }, merge=True)
+
+
+def area_of(location):
+    if not location or location.get("lat") is None or location.get("lng") is None:
+        return None
+    return geo_index.encode(location["lat"], location["lng"], LEADERBOARD_AREA_PRECISION)
+
+
+def board_id(area=None):
+    return f"area_{area}" if area else GLOBAL_BOARD
+
+
+# ========== 🔄 ROLL-UP ==========
+def _has_pending(shard):
+    return shard.get("dirty") or shard.get("points") or shard.get("added_plants") or shard.get("quests_completed")
+
+
+def _fold_user(transaction, user_id, user_doc, shards):
+    """Write the user's pending shards onto the user document; returns the new leaderboard entry."""
+    pending = sum(shard.get("points") or 0 for _, shard in shards)
+    added_plants = sorted({plant_id for _, shard in shards for plant_id in shard.get("added_plants") or []})
+    quests_completed = sorted({quest_id for _, shard in shards for quest_id in shard.get("quests_completed") or []})
+    for ref, shard in shards:
+        reset = {"dirty": False}
+        if shard.get("points"):
+            reset["points"] = firestore.Increment(-shard["points"])
+        for field in ("added_plants", "quests_completed"):
+            if shard.get(field):
+                reset[field] = firestore.ArrayRemove(shard[field])
+        transaction.update(ref, reset)
+    if not user_doc.exists:
+        print(f"Discarding {pending} eco points for missing user {user_id}")
+        return None
+
+    user = user_doc.to_dict()
+    area = area_of(user.get("location"))
+    update = {}
+    if pending:
+        update["eco_points"] = firestore.Increment(pending)
+    if added_plants:
+        update["added_plants"] = firestore.ArrayUnion(added_plants)
+    if quests_completed:
+        update["quests_completed"] = firestore.ArrayUnion(quests_completed)
+        update["active_quests"] = firestore.ArrayRemove(quests_completed)
+    if area != user.get("leaderboard_area"):
+        update["leaderboard_area"] = area
+    if update:
+        transaction.update(user_doc.reference, update)
+    if not pending and area == user.get("leaderboard_area"):
+        return None
+
+    return {
+        "user_id": user_id,
+        "name": user.get("name"),
+        "points": (user.get("eco_points") or 0) + pending,
+        "area": area,
+        "previous_area": user.get("leaderboard_area"),
+    }
+
+
+def board_changes(totals):
+    """{board_id: (entries, removed_user_ids)} for a set of new totals."""
+    boards = {}
+    for total in totals:
+        entry = {"user_id": total["user_id"], "name": total["name"], "points": total["points"]}
+        areas = [None, total["area"]] if total["area"] else [None]
+        for area in areas:
+            boards.setdefault(board_id(area), ([], set()))[0].append(entry)
+        if total["previous_area"] and total["previous_area"] != total["area"]:
+            boards.setdefault(board_id(total["previous_area"]), ([], set()))[1].add(total["user_id"])
+    return boards
+
+
+def merged_board(current, entries, removed):
+    """The top LEADERBOARD_SIZE of `current` with changed totals merged in and `removed` users dropped."""
+    by_user = {entry["user_id"]: entry for entry in current if entry["user_id"] not in removed}
+    for entry in entries:
+        existing = by_user.get(entry["user_id"])
+        if existing is None or entry["points"] >= existing["points"]:
+            by_user[entry["user_id"]] = entry
+    return sorted(by_user.values(), key=lambda e: (-e["points"], e["user_id"]))[:LEADERBOARD_SIZE]
+
+
+def area_board_from_users(transaction, area, limit):
+    """The area's top `limit` users as stored on Users, read in `transaction`."""
+    query = (db.collection("Users")
+             .where("leaderboard_area", "==", area)
+             .order_by("eco_points", direction=firestore.Query.DESCENDING)
+             .limit(limit))
+    entries = []
+    for doc in transaction.get(query):
+        user = doc.to_dict() or {}
+        entries.append({"user_id": doc.id, "name": user.get("name"), "points": user.get("eco_points") or 0})
+    return entries
+
+
+def roll_up_users(transaction, user_ids):
+    """Fold the users' pending shards into their documents and the leaderboards, all in `transaction`.
+
+    Totals and boards commit together, so a crash can't leave a user's new
+    total missing from the boards. Returns (totals, boards_written).
+    """
+    shards = {}
+    for doc in transaction.get(db.collection(SHARDS_COLLECTION).where("user_id", "in", list(user_ids))):
+        shard = doc.to_dict() or {}
+        if _has_pending(shard):
+            shards.setdefault(shard["user_id"], []).append((doc.reference, shard))
+    if not shards:
+        return [], 0
+    user_docs = {doc.id: doc for doc in
+                 transaction.get_all([db.collection("Users").document(user_id) for user_id in shards])}
+
+    # Every read comes before the first write: also read each board the users may join or leave
+    users = [(doc.to_dict() or {}) if doc.exists else {} for doc in user_docs.values()]
+    boards = {GLOBAL_BOARD} | {board_id(area) for user in users
+                               for area in (area_of(user.get("location")), user.get("leaderboard_area")) if area}
+    board_docs = {doc.id: doc for doc in transaction.get_all(
+        [db.collection(LEADERBOARDS_COLLECTION).document(board) for board in sorted(boards)])}
+    current = {board: (doc.to_dict() or {}).get("entries", []) if doc.exists else []
+               for board, doc in board_docs.items()}
+
+    # Dropping a user from a full area board would leave a gap that only
+    # Users can fill: rebuild those boards from a query
+    leaving = {}
+    for user_id, user in zip(user_docs, users):
+        previous = user.get("leaderboard_area")
+        if previous and previous != area_of(user.get("location")):
+            leaving.setdefault(previous, set()).add(user_id)
+    rebuilt = {}
+    for area, leavers in leaving.items():
+        board = board_id(area)
+        on_board = {entry["user_id"] for entry in current[board]}
+        if len(current[board]) >= LEADERBOARD_SIZE and leavers & on_board:
+            rebuilt[board] = area_board_from_users(transaction, area, LEADERBOARD_SIZE + len(leavers))
+
+    totals = []
+    for user_id in shards:
+        total = _fold_user(transaction, user_id, user_docs[user_id], shards[user_id])
+        if total is not None:
+            totals.append(total)
+
+    written = 0
+    for board, (entries, removed) in board_changes(totals).items():
+        # Rebuilt boards still list the leavers (and old totals): merging drops and updates them
+        ranked = merged_board(rebuilt.get(board, current[board]), entries, removed)
+        if ranked != current[board]:
+            transaction.set(board_docs[board].reference,
+                            {"entries": ranked, "updated_at": firestore.SERVER_TIMESTAMP})
+            written += 1
+    return totals, written
+
+
+class EcoPointsRollup:
+    def __init__(self, interval=10.0, batch_size=200):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._counters = {"runs": 0, "users": 0, "boards_written": 0, "errors": 0}
+        self._last_run = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None or self.interval <= 0:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="eco-points-rollup", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def run(self):
+        """Roll up every `interval` seconds in the calling thread until stop()."""
+        while not self._stop.wait(self.interval):
+            try:
+                self.drain()
+            except Exception as e:
+                print(f"Eco points roll-up failed: {e}")
+                with self._lock:
+                    self._counters["errors"] += 1
+
+    def drain(self):
+        """Roll up batches back to back until the backlog is gone; returns how many shards were seen."""
+        seen = 0
+        while not self._stop.is_set():
+            shards = self.run_once()
+            seen += shards
+            if shards < self.batch_size:
+                break
+        return seen
+
+    def run_once(self):
+        """Roll up the users owning the next `batch_size` dirty shards; returns how many shards were seen."""
+        shards = list(db.collection(SHARDS_COLLECTION)
+                      .where("dirty", "==", True)
+                      .select(["user_id"])
+                      .limit(self.batch_size)
+                      .stream())
+        user_ids = sorted({(doc.to_dict() or {}).get("user_id") for doc in shards} - {None})
+
+        totals, written = [], 0
+        for i in range(0, len(user_ids), ROLLUP_USERS_PER_TRANSACTION):
+            chunk_totals, chunk_written = firestore.transactional(roll_up_users)(
+                db.transaction(), user_ids[i:i + ROLLUP_USERS_PER_TRANSACTION])
+            totals += chunk_totals
+            written += chunk_written
+
+        with self._lock:
+            self._counters["runs"] += 1
+            self._counters["users"] += len(totals)
+            self._counters["boards_written"] += written
+            self._last_run = time.time()
+        return len(shards)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            last_run = self._last_run
+        return {
+            **counters,
+            "running": self._thread is not None,
+            "interval_seconds": self.interval,
+            "shards_per_user": ECO_POINTS_SHARDS,
+            "last_run_at": last_run,
+        }
+
+
+# ECO_POINTS_ROLLUP_SECONDS=0 leaves roll-ups to other processes
+rollup = EcoPointsRollup(interval=ECO_POINTS_ROLLUP_SECONDS)
+
+
+# ========== 🏆 LEADERBOARD ==========
+def get_leaderboard(area=None, limit=LEADERBOARD_SIZE):
+    board_doc = db.collection(LEADERBOARDS_COLLECTION).document(board_id(area)).get()
+    entries = (board_doc.to_dict() or {}).get("entries", []) if board_doc.exists else []
+    return [{"rank": rank, **entry} for rank, entry in enumerate(entries[:limit], start=1)]
@@ -0,0 +1,131 @@
+import math
+
+# Geohash cell index for plant locations.
+# Every plant stores a `geohash` string; a radius query becomes a handful of
+# prefix range queries over the 3x3 block of cells around the point, followed
+# by an exact distance check on the (few) documents that come back.
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+GEOHASH_PRECISION = 10
+METERS_PER_DEG_LAT = 111320.0
+
+
+def encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                value = (value << 1) | 1
+                lng_lo = mid
+            else:
+                value <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def decode_bbox(geohash):
+    """Return (lat_lo, lat_hi, lng_lo, lng_hi) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for c in geohash:
+        value = _DECODE[c]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if bit:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lat_hi, lng_lo, lng_hi
+
+
+def cell_size_deg(precision):
+    """Return (lat_height, lng_width) in degrees of a cell at this precision."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def precision_for_radius(lat, radius_m):
+    """Finest precision whose cells are at least `radius_m` on both sides."""
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_h, lng_w = cell_size_deg(precision)
+        if (lat_h * METERS_PER_DEG_LAT >= radius_m and
+                lng_w * METERS_PER_DEG_LAT * cos_lat >= radius_m):
+            return precision
+    return 1
+
+
+def covering_cells(lat, lng, radius_m):
+    """Geohash prefixes (center cell plus its neighbours) covering the circle."""
+    precision = precision_for_radius(lat, radius_m)
+    center = encode(lat, lng, precision)
+    lat_lo, lat_hi, lng_lo, lng_hi = decode_bbox(center)
+    lat_h = lat_hi - lat_lo
+    lng_w = lng_hi - lng_lo
+    mid_lat = (lat_lo + lat_hi) / 2
+    mid_lng = (lng_lo + lng_hi) / 2
+
+    cells = set()
+    for d_lat in (-1, 0, 1):
+        for d_lng in (-1, 0, 1):
+            n_lat = mid_lat + d_lat * lat_h
+            if n_lat > 90 or n_lat < -90:
+                continue
+            n_lng = (mid_lng + d_lng * lng_w + 180) % 360 - 180
+            cells.add(encode(n_lat, n_lng, precision))
+    return sorted(cells)
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    from geopy.distance import geodesic
+    return geodesic((lat1, lng1), (lat2, lng2)).meters
+
+
+def query_within(collection, lat, lng, radius_m):
+    """Yield (doc_snapshot, data, distance_m) for docs in `collection` within `radius_m`."""
+    for prefix in covering_cells(lat, lng, radius_m):
+        docs = collection \
+            .where("geohash", ">=", prefix) \
+            .where("geohash", "<=", prefix + "\uf8ff") \
+            .stream()
+        for doc in docs:
+            data = doc.to_dict()
+            location = data.get("location") or {}
+            if location.get("lat") is None or location.get("lng") is None:
+                continue
+            dist = distance_m(lat, lng, location["lat"], location["lng"])
+            if dist <= radius_m:
+                yield doc, data, dist
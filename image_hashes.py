@@ -0,0 +1,138 @@
+import os
+import threading
+
+# Perceptual hashes for duplicate-plant detection.
+# Hashes are computed once at registration and stored on the plant as hex
+# strings under `image_hashes`. PlantHashIndex keeps them in a BK-tree (kept in
+# sync by an on_snapshot listener) so a duplicate check is a Hamming-distance
+# search instead of decoding every nearby plant's image.
+
+# Names of the imagehash functions; imagehash itself is only imported once
+# something is hashed
+HASH_ALGORITHMS = {
+    "ahash": "average_hash",
+    "phash": "phash",
+    "dhash": "dhash",
+}
+DUPLICATE_HASH = os.environ.get("DUPLICATE_HASH", "ahash")
+DUPLICATE_THRESHOLD = int(os.environ.get("DUPLICATE_THRESHOLD", 5))
+
+
+def hash_image(image, algorithm):
+    import imagehash
+    return str(getattr(imagehash, HASH_ALGORITHMS[algorithm])(image))
+
+
+def compute_hashes(image):
+    """Hex-encoded hashes of a PIL image for every supported algorithm."""
+    return {name: hash_image(image, name) for name in HASH_ALGORITHMS}
+
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+class BKTree:
+    """BK-tree over integer hashes under Hamming distance; each node holds a set of keys."""
+
+    def __init__(self):
+        self._root = None
+
+    def add(self, value, key):
+        if self._root is None:
+            self._root = [value, {key}, {}]
+            return
+        node = self._root
+        while True:
+            distance = bin(node[0] ^ value).count("1")
+            if distance == 0:
+                node[1].add(key)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, {key}, {}]
+                return
+            node = child
+
+    def remove(self, value, key):
+        # Nodes stay in place (they route searches); only the key is dropped
+        node = self._root
+        while node is not None:
+            distance = bin(node[0] ^ value).count("1")
+            if distance == 0:
+                node[1].discard(key)
+                return
+            node = node[2].get(distance)
+
+    def search(self, value, max_distance):
+        """Return {key: distance} for every key within `max_distance` of `value`."""
+        found = {}
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = bin(node[0] ^ value).count("1")
+            if distance <= max_distance:
+                for key in node[1]:
+                    found[key] = distance
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+class PlantHashIndex:
+    def __init__(self, collection, algorithm=DUPLICATE_HASH):
+        self._collection = collection
+        self.algorithm = algorithm
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._watch = None
+        self._tree = BKTree()
+        self._hashes = {}
+
+    def start(self):
+        with self._lock:
+            if self._watch is None:
+                self._watch = self._collection.on_snapshot(self._on_snapshot)
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def _on_snapshot(self, doc_snapshots, changes, read_time):
+        for change in changes:
+            try:
+                if change.type.name == "REMOVED":
+                    self.discard(change.document.id)
+                else:
+                    hashes = (change.document.to_dict() or {}).get("image_hashes") or {}
+                    self.add(change.document.id, hashes)
+            except Exception as e:
+                print(f"Error indexing image hash for {change.document.id}: {e}")
+        self._ready.set()
+
+    def add(self, plant_id, hashes):
+        value = hashes.get(self.algorithm)
+        with self._lock:
+            previous = self._hashes.get(plant_id)
+            if previous == value:
+                return
+            if previous is not None:
+                self._tree.remove(int(previous, 16), plant_id)
+                del self._hashes[plant_id]
+            if value is not None:
+                self._tree.add(int(value, 16), plant_id)
+                self._hashes[plant_id] = value
+
+    def discard(self, plant_id):
+        with self._lock:
+            previous = self._hashes.pop(plant_id, None)
+            if previous is not None:
+                self._tree.remove(int(previous, 16), plant_id)
+
+    def has(self, plant_id):
+        return plant_id in self._hashes
+
+    def search(self, hashes, max_distance=DUPLICATE_THRESHOLD):
+        """Plant IDs whose stored hash is within `max_distance`: {plant_id: distance}."""
+        with self._lock:
+            return self._tree.search(int(hashes[self.algorithm], 16), max_distance)
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+from PIL import Image
+
+# Content-addressed storage for plant images.
+# Images are keyed by the SHA-256 of the compressed upload; the thumbnail and
+# medium derivatives are generated once at upload time and stored next to it,
+# so plant documents only need to carry `image_digest`.
+
+VARIANTS = {
+    "thumb": (128, 128),
+    "medium": (512, 512),
+}
+ORIGINAL = "original"
+JPEG_QUALITY = 80
+
+
+class LocalImageStore:
+    """Filesystem backend for tests and on-prem deployments."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, digest, variant):
+        return os.path.join(self.root, digest[:2], digest, f"{variant}.jpg")
+
+    def exists(self, digest, variant=ORIGINAL):
+        return os.path.exists(self._path(digest, variant))
+
+    def put(self, digest, variant, data):
+        path = self._path(digest, variant)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so readers never see a partial image; the temp name
+        # is unique per call, so concurrent writers of one digest don't collide
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{variant}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def get(self, digest, variant=ORIGINAL):
+        try:
+            with open(self._path(digest, variant), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+class BucketImageStore:
+    """Cloud Storage backend (the Firebase project's bucket) for production."""
+
+    def __init__(self, bucket_name=None, prefix="plants"):
+        import clients
+        from firebase_admin import storage
+        # storage.bucket() needs the default Firebase app
+        clients.firebase_app.get()
+        self.bucket = storage.bucket(bucket_name)
+        self.prefix = prefix
+
+    def _blob(self, digest, variant):
+        return self.bucket.blob(f"{self.prefix}/{digest}/{variant}.jpg")
+
+    def exists(self, digest, variant=ORIGINAL):
+        return self._blob(digest, variant).exists()
+
+    def put(self, digest, variant, data):
+        blob = self._blob(digest, variant)
+        blob.cache_control = "public, max-age=31536000, immutable"
+        blob.upload_from_string(data, content_type="image/jpeg")
+
+    def get(self, digest, variant=ORIGINAL):
+        from google.api_core.exceptions import NotFound
+        try:
+            return self._blob(digest, variant).download_as_bytes()
+        except NotFound:
+            return None
+
+
+def get_image_store():
+    backend = os.environ.get("IMAGE_STORE", "local")
+    if backend == "bucket":
+        return BucketImageStore(os.environ.get("IMAGE_BUCKET"))
+    if backend == "local":
+        return LocalImageStore(os.environ.get("IMAGE_STORE_PATH", "./image_store"))
+    raise ValueError(f"Unknown IMAGE_STORE backend: {backend}")
+
+
+def image_digest(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def make_variant(image_bytes, max_size):
+    image = Image.open(BytesIO(image_bytes))
+    if image.width <= max_size[0] and image.height <= max_size[1]:
+        return image_bytes
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail(max_size)
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def store_image(store, image_bytes):
+    """Store a JPEG and its derivatives; returns its digest. Already-stored images are skipped."""
+    digest = image_digest(image_bytes)
+    if store.exists(digest, ORIGINAL):
+        return digest
+    for variant, max_size in VARIANTS.items():
+        store.put(digest, variant, make_variant(image_bytes, max_size))
+    # Original last: its presence marks the whole set as complete
+    store.put(digest, ORIGINAL, image_bytes)
+    return digest
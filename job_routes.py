@@ -0,0 +1,43 @@
+import json
+import time
+from flask import Blueprint, Response, jsonify, stream_with_context
+
+from jobs import job_queue, TERMINAL
+
+job_bp = Blueprint("jobs", __name__)
+SSE_POLL_SECONDS = 0.5
+SSE_HEARTBEAT_SECONDS = 15
+
+
+@job_bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@job_bp.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    if job_queue.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        last_stage = None
+        last_sent = time.monotonic()
+        while True:
+            job = job_queue.get(job_id)
+            if job["stage"] != last_stage:
+                last_stage = job["stage"]
+                last_sent = time.monotonic()
+                event = "done" if job["status"] in TERMINAL else "progress"
+                yield f"event: {event}\ndata: {json.dumps(job)}\n\n"
+                if event == "done":
+                    return
+            elif time.monotonic() - last_sent >= SSE_HEARTBEAT_SECONDS:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            time.sleep(SSE_POLL_SECONDS)
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,245 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Durable background job queue.
+# Jobs are rows in a local SQLite database, so queued work survives a
+# restart; a fixed pool of worker threads claims and runs them. Handlers are
+# registered per job kind and receive (payload, progress) where progress(stage)
+# records how far the job has got. A handler returns (result_dict, http_status).
+# A running job holds a lease: its row names the queue instance that claimed
+# it (a fresh ID per process start, so PID reuse can't fake an owner) and a
+# lease_until that the owner's heartbeat keeps pushing forward. Once a lease
+# expires the owner is gone and the next claim puts the job back in the queue,
+# unless it has already been claimed max_attempts times, in which case it is
+# marked failed. Finished jobs are deleted retention_seconds after they ended.
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL = (SUCCEEDED, FAILED)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, path, workers=2, max_queued=100, lease_seconds=60.0, max_attempts=3,
+                 retention_seconds=7 * 24 * 3600):
+        self.path = path
+        self.workers = workers
+        self.max_queued = max_queued
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # 0 keeps finished jobs forever
+        self.retention_seconds = retention_seconds
+        self.instance_id = uuid.uuid4().hex
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._threads = []
+        self._conn = None
+
+    def _db(self):
+        # Caller holds self._lock
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit; claims take an explicit IMMEDIATE transaction so two
+            # processes sharing the file never run the same job
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    http_status INTEGER,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    owner TEXT,
+                    lease_until REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            # Spools created before leases only have owner_pid
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (status, updated_at)")
+        return self._conn
+
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, kind, payload):
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        self.start()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFullError(f"{queued} jobs already queued")
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, stage, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, QUEUED, json.dumps(payload), now, now)
+            )
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            position = None
+            if row is not None and row["status"] == QUEUED:
+                position = self._db().execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?",
+                    (QUEUED, row["created_at"])
+                ).fetchone()[0]
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "stage": row["stage"],
+            "queue_position": position,
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "http_status": row["http_status"],
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def _update(self, job_id, **fields):
+        # Only while this instance still holds the job; after its lease lapsed
+        # the job belongs to whoever claimed it next
+        fields["updated_at"] = time.time()
+        if fields.get("status", RUNNING) == RUNNING:
+            fields["lease_until"] = fields["updated_at"] + self.lease_seconds
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            conn = self._db()
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ? AND owner = ?",
+                         (*fields.values(), job_id, self.instance_id))
+
+    def _claim(self):
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                # Jobs whose owner stopped renewing its lease go back in the
+                # queue; ones that keep losing their worker (say, a payload
+                # that kills the process) give up instead
+                conn.execute(
+                    "UPDATE jobs SET status = ?, stage = ?, http_status = 500, error = ?, owner = NULL, "
+                    "lease_until = NULL, updated_at = ? "
+                    "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?) AND attempts >= ?",
+                    (FAILED, FAILED, f"Worker lost {self.max_attempts} times, giving up", now,
+                     RUNNING, now, self.max_attempts)
+                )
+                conn.execute(
+                    "UPDATE jobs SET status = ?, stage = ?, owner = NULL, lease_until = NULL, updated_at = ? "
+                    "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)",
+                    (QUEUED, QUEUED, now, RUNNING, now)
+                )
+                row = conn.execute(
+                    "SELECT id, kind, payload FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, stage = ?, attempts = attempts + 1, owner = ?, lease_until = ?, "
+                        "updated_at = ? WHERE id = ?",
+                        (RUNNING, "started", self.instance_id, now + self.lease_seconds, now, row["id"])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            if row is None:
+                self._wakeup.wait(timeout=1.0)
+                return None
+            return row["id"], row["kind"], json.loads(row["payload"])
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                with self._lock:
+                    self._db().execute(
+                        "UPDATE jobs SET lease_until = ? WHERE status = ? AND owner = ?",
+                        (time.time() + self.lease_seconds, RUNNING, self.instance_id)
+                    )
+            except sqlite3.Error as e:
+                print(f"Job lease renewal failed: {e}")
+            try:
+                self.prune()
+            except sqlite3.Error as e:
+                print(f"Job pruning failed: {e}")
+
+    def prune(self):
+        """Delete jobs that finished more than retention_seconds ago; returns how many."""
+        if self.retention_seconds <= 0:
+            return 0
+        with self._lock:
+            cursor = self._db().execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' for _ in TERMINAL)}) AND updated_at < ?",
+                (*TERMINAL, time.time() - self.retention_seconds)
+            )
+        return cursor.rowcount
+
+    def _work(self):
+        while True:
+            claimed = self._claim()
+            if claimed is None:
+                continue
+            job_id, kind, payload = claimed
+            try:
+                result, http_status = self._handlers[kind](payload, lambda stage: self._update(job_id, stage=stage))
+                status = SUCCEEDED if 200 <= http_status < 300 else FAILED
+                self._update(job_id, status=status, stage=status, result=json.dumps(result),
+                             http_status=http_status, error=None if status == SUCCEEDED else result.get("error"))
+            except Exception as e:
+                print(f"Job {job_id} ({kind}) crashed: {e}")
+                self._update(job_id, status=FAILED, stage=FAILED, http_status=500, error=str(e))
+
+
+job_queue = JobQueue(
+    os.environ.get("JOB_DB_PATH", "./job_spool/jobs.sqlite3"),
+    workers=int(os.environ.get("JOB_WORKERS", 2)),
+    max_queued=int(os.environ.get("JOB_MAX_QUEUED", 100)),
+    lease_seconds=float(os.environ.get("JOB_LEASE_SECONDS", 60)),
+    max_attempts=int(os.environ.get("JOB_MAX_ATTEMPTS", 3)),
+    retention_seconds=float(os.environ.get("JOB_RETENTION_SECONDS", 7 * 24 * 3600))
+)
@@ -0,0 +1,139 @@
+import argparse
+import hashlib
+import random
+import time
+import uuid
+from datetime import datetime
+from flask import Flask, request, jsonify
+
+# Local stand-in for the KindWise plant.id v3 API, for tests and benchmarks.
+# Point the backend at it with PLANT_API_HOST=http://localhost:5001.
+#
+#   python kindwise_stub.py --port 5001 --latency 0.8 --health-failure-rate 0.1
+
+app = Flask(__name__)
+config = {
+    "latency": 0.0,
+    "jitter": 0.0,
+    "health_failure_rate": 0.0,
+    "not_plant_rate": 0.0,
+}
+
+SPECIES = [
+    ("Azadirachta indica", ["Neem"]),
+    ("Ficus religiosa", ["Sacred fig", "Peepal"]),
+    ("Ocimum tenuiflorum", ["Holy basil", "Tulsi"]),
+    ("Mangifera indica", ["Mango"]),
+]
+DISEASES = [
+    ("water deficiency", "The plant shows signs of insufficient watering."),
+    ("fungi", "A fungal infection is affecting the leaves."),
+    ("nutrient deficiency", "The plant is lacking essential nutrients."),
+]
+
+
+def _simulate_latency():
+    delay = config["latency"] + random.uniform(0, config["jitter"])
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _image_seed():
+    # Same image -> same answer, so repeated benchmark runs are comparable
+    payload = request.get_json(silent=True) or {}
+    images = payload.get("images") or [""]
+    return int(hashlib.sha256(images[0].encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _evaluation(binary, probability):
+    return {"probability": probability, "binary": binary, "threshold": 0.5}
+
+
+def _envelope(result):
+    payload = request.get_json(silent=True) or {}
+    now = time.time()
+    return {
+        "access_token": uuid.uuid4().hex,
+        "model_version": "stub:1.0",
+        "custom_id": payload.get("custom_id"),
+        "input": {
+            "images": ["stub://image"],
+            "datetime": datetime.now().isoformat(),
+            "latitude": payload.get("latitude"),
+            "longitude": payload.get("longitude"),
+            "similar_images": payload.get("similar_images", True),
+        },
+        "result": result,
+        "status": "COMPLETED",
+        "sla_compliant_client": True,
+        "sla_compliant_system": True,
+        "created": now,
+        "completed": now,
+    }
+
+
+@app.route("/api/v3/identification", methods=["POST"])
+def identification():
+    _simulate_latency()
+    rng = random.Random(_image_seed())
+    is_plant = rng.random() >= config["not_plant_rate"]
+
+    suggestions = []
+    for i, (name, common_names) in enumerate(rng.sample(SPECIES, 2)):
+        suggestions.append({
+            "id": f"stub-{i}",
+            "name": name,
+            "probability": round(0.9 - i * 0.4, 2),
+            "details": {"common_names": common_names, "url": f"https://en.wikipedia.org/wiki/{name.replace(' ', '_')}"},
+        })
+
+    return jsonify(_envelope({
+        "is_plant": _evaluation(is_plant, 0.98 if is_plant else 0.05),
+        "classification": {"suggestions": suggestions},
+    })), 201
+
+
+@app.route("/api/v3/health_assessment", methods=["POST"])
+def health_assessment():
+    _simulate_latency()
+    if random.random() < config["health_failure_rate"]:
+        return jsonify({"error": "Stub health assessment failure"}), 503
+
+    rng = random.Random(_image_seed())
+    is_healthy = rng.random() < 0.6
+    suggestions = [
+        {
+            "id": f"stub-disease-{i}",
+            "name": name,
+            "probability": round(rng.uniform(0.05, 0.6), 2),
+            "details": {
+                "description": description,
+                "treatment": {"biological": ["Adjust care and monitor the leaves."]},
+            },
+        }
+        for i, (name, description) in enumerate(DISEASES)
+    ]
+
+    return jsonify(_envelope({
+        "is_plant": _evaluation(True, 0.98),
+        "is_healthy": _evaluation(is_healthy, 0.8 if is_healthy else 0.2),
+        "disease": {"suggestions": suggestions},
+    })), 201
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local KindWise stub server")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Base seconds of delay per call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay up to this many seconds")
+    parser.add_argument("--health-failure-rate", type=float, default=0.0)
+    parser.add_argument("--not-plant-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config.update(
+        latency=args.latency,
+        jitter=args.jitter,
+        health_failure_rate=args.health_failure_rate,
+        not_plant_rate=args.not_plant_rate,
+    )
+    app.run(host="127.0.0.1", port=args.port, threaded=True)
@@ -0,0 +1,227 @@
+import argparse
+import base64
+from io import BytesIO
+from PIL import Image
+from datetime import datetime
+import pytz
+from firebase_admin import credentials, initialize_app, firestore
+import firebase_admin
+from dotenv import load_dotenv
+
+import geo_index
+import quest_schedule
+import image_hashes
+import image_store
+import eco_points
+import quest_feed
+
+load_dotenv()
+
+if not firebase_admin._apps:
+    cred = credentials.Certificate("./plantquest-8a4bd-firebase-adminsdk-fbsvc-ffc04c7186.json")
+    initialize_app(cred)
+
+db = firestore.client()
+BATCH_SIZE = 400
+
+
+# ========== 📍 GEOHASH BACKFILL ==========
+def backfill_geohash(dry_run=False):
+    batch = db.batch()
+    pending = 0
+    updated = 0
+
+    for plant_doc in db.collection("Plants").select(["location", "geohash"]).stream():
+        plant = plant_doc.to_dict()
+        location = plant.get("location") or {}
+        if location.get("lat") is None or location.get("lng") is None:
+            print(f"Skipping {plant_doc.id}: no location")
+            continue
+
+        geohash = geo_index.encode(location["lat"], location["lng"])
+        if plant.get("geohash") == geohash:
+            continue
+
+        updated += 1
+        if dry_run:
+            continue
+        batch.update(plant_doc.reference, {"geohash": geohash})
+        pending += 1
+        if pending >= BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+    print(f"Geohash backfill: {updated} plants {'would be ' if dry_run else ''}updated")
+
+
+# ========== 📅 QUEST SCHEDULE ==========
+def build_quest_schedule(dry_run=False):
+    now = datetime.now(pytz.UTC)
+    plant_ids = [plant_doc.id for plant_doc in db.collection("Plants").select([]).stream()]
+    quests = (
+        quest_doc.to_dict()
+        for quest_doc in db.collection("Quests").select(["plant_id", "type", "created_at"]).stream()
+    )
+    schedule = quest_schedule.derive_schedule(quests, plant_ids, now)
+
+    due_now = sum(1 for entry in schedule.values() if entry["next_due_at"] <= now)
+    print(f"Quest schedule: {len(schedule)} entries for {len(plant_ids)} plants, {due_now} due now")
+    if dry_run:
+        return
+
+    batch = db.batch()
+    pending = 0
+    for (plant_id, quest_type), entry in schedule.items():
+        batch.set(quest_schedule.schedule_ref(db, plant_id, quest_type), entry)
+        pending += 1
+        if pending >= BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+
+
+# ========== 🖼️ IMAGE HASHES ==========
+def backfill_image_hashes(dry_run=False):
+    batch = db.batch()
+    pending = 0
+    updated = 0
+
+    store = image_store.get_image_store()
+
+    for plant_doc in db.collection("Plants").select(["image_base64", "image_digest", "image_hashes"]).stream():
+        plant = plant_doc.to_dict()
+        if set(image_hashes.HASH_ALGORITHMS) <= set(plant.get("image_hashes") or {}):
+            continue
+        if plant.get("image_digest"):
+            image_data = store.get(plant["image_digest"])
+        elif plant.get("image_base64"):
+            image_data = base64.b64decode(plant["image_base64"])
+        else:
+            image_data = None
+        if not image_data:
+            print(f"Skipping {plant_doc.id}: no image")
+            continue
+
+        try:
+            image = Image.open(BytesIO(image_data))
+            hashes = image_hashes.compute_hashes(image)
+        except Exception as e:
+            print(f"Skipping {plant_doc.id}: {e}")
+            continue
+
+        updated += 1
+        if dry_run:
+            continue
+        batch.update(plant_doc.reference, {"image_hashes": hashes})
+        pending += 1
+        if pending >= BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+    print(f"Image hash backfill: {updated} plants {'would be ' if dry_run else ''}updated")
+
+
+# ========== 🗃️ IMAGE STORE ==========
+def move_images_to_store(dry_run=False):
+    store = image_store.get_image_store()
+    moved = 0
+
+    # One plant per commit: each document can carry a large base64 blob
+    plants = db.collection("Plants").where("image_base64", ">", "").select(["image_base64", "image_hashes"]).stream()
+    for plant_doc in plants:
+        plant = plant_doc.to_dict()
+        try:
+            image_bytes = base64.b64decode(plant["image_base64"])
+            Image.open(BytesIO(image_bytes)).verify()
+        except Exception as e:
+            print(f"Skipping {plant_doc.id}: {e}")
+            continue
+
+        moved += 1
+        if dry_run:
+            continue
+
+        digest = image_store.store_image(store, image_bytes)
+        update = {"image_digest": digest, "image_base64": firestore.DELETE_FIELD}
+        if not plant.get("image_hashes"):
+            update["image_hashes"] = image_hashes.compute_hashes(Image.open(BytesIO(image_bytes)))
+        plant_doc.reference.update(update)
+
+    print(f"Image store migration: {moved} plants {'would be ' if dry_run else ''}moved")
+
+
+# ========== 🏆 LEADERBOARDS ==========
+def build_leaderboards(dry_run=False):
+    """Seed the leaderboard documents from Users.eco_points; the roll-up keeps them current afterwards."""
+    boards = {}
+    batch = db.batch()
+    pending = 0
+
+    for user_doc in db.collection("Users").select(["eco_points", "location", "name", "leaderboard_area"]).stream():
+        user = user_doc.to_dict()
+        area = eco_points.area_of(user.get("location"))
+        entry = {"user_id": user_doc.id, "name": user.get("name"), "points": user.get("eco_points") or 0}
+        boards.setdefault(eco_points.board_id(), []).append(entry)
+        if area:
+            boards.setdefault(eco_points.board_id(area), []).append(entry)
+
+        # The roll-up uses this to take users off the board of an area they left
+        if area != user.get("leaderboard_area") and not dry_run:
+            batch.update(user_doc.reference, {"leaderboard_area": area})
+            pending += 1
+            if pending >= BATCH_SIZE:
+                batch.commit()
+                batch = db.batch()
+                pending = 0
+
+    if pending:
+        batch.commit()
+
+    for board, entries in boards.items():
+        ranked = sorted(entries, key=lambda e: (-e["points"], e["user_id"]))[:eco_points.LEADERBOARD_SIZE]
+        if not dry_run:
+            db.collection(eco_points.LEADERBOARDS_COLLECTION).document(board).set({
+                "entries": ranked,
+                "updated_at": firestore.SERVER_TIMESTAMP
+            })
+    print(f"Leaderboards: {len(boards)} boards {'would be ' if dry_run else ''}written")
+
+
+# ========== 📋 QUEST FEEDS ==========
+def build_quest_feeds(dry_run=False):
+    """Build every user's quest feed now instead of on their first /user/quests."""
+    built = 0
+    for user_doc in db.collection("Users").select([]).stream():
+        feed_doc = quest_feed.feed_ref(db, user_doc.id).get(field_paths=["complete"])
+        if feed_doc.exists and (feed_doc.to_dict() or {}).get("complete"):
+            continue
+        built += 1
+        if not dry_run:
+            firestore.transactional(quest_feed.build_feed)(db.transaction(), db, user_doc.id)
+    print(f"Quest feeds: {built} users {'would be ' if dry_run else ''}built")
+
+
+MIGRATIONS = {
+    "geohash": backfill_geohash,
+    "quest_schedule": build_quest_schedule,
+    "image_hashes": backfill_image_hashes,
+    "images": move_images_to_store,
+    "leaderboards": build_leaderboards,
+    "quest_feeds": build_quest_feeds,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="One-off PlantQuest data migrations")
+    parser.add_argument("migration", choices=sorted(MIGRATIONS))
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    MIGRATIONS[args.migration](dry_run=args.dry_run)
@@ -0,0 +1,285 @@
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Admission control for calls to external APIs (KindWise, Gemini).
+# Each provider gets a governor that bounds concurrent calls, paces them with
+# a token bucket, retries rate-limit and server errors with jittered
+# exponential backoff, and makes waiting callers give up after a queue
+# deadline. Callers that cannot be served in time get OverloadedError, which
+# routes turn into a 503 with Retry-After instead of a generic failure.
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+_STATUS_IN_MESSAGE = re.compile(r"status_code=(\d{3})")
+
+
+class OverloadedError(Exception):
+    def __init__(self, provider, message, retry_after=1):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.retry_after = max(1, int(round(retry_after)))
+
+
+def status_code_of(error):
+    """HTTP status carried by an exception from requests, google-api-core or the KindWise client."""
+    for candidate in (getattr(error, "code", None), getattr(error, "status_code", None),
+                      getattr(getattr(error, "response", None), "status_code", None)):
+        try:
+            if candidate is not None and 100 <= int(candidate) < 600:
+                return int(candidate)
+        except (TypeError, ValueError):
+            continue
+    # kindwise raises ValueError("... response.status_code=429 ...")
+    match = _STATUS_IN_MESSAGE.search(str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_retryable(error):
+    status = status_code_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # Connection resets and timeouts without a response
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in (
+        "ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout", "DeadlineExceeded", "ServiceUnavailable")
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        """Take a token if one is available, else return the seconds until one will be."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, deadline):
+        """Take one token, waiting until `deadline` (monotonic) at the latest."""
+        while True:
+            wait = self._take()
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, deadline):
+        while True:
+            wait = self._take()
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+class ProviderGovernor:
+    def __init__(self, name, max_concurrent=8, rate=10.0, burst=None, max_queue=64, queue_timeout=10.0,
+                 max_retries=3, base_delay=0.5, max_delay=8.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.bucket = TokenBucket(rate, burst or max(1, max_concurrent))
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._counters = {"waiting": 0, "active": 0, "calls": 0, "retries": 0, "rejected": 0, "failed": 0}
+        self._loop = None
+        self._async_semaphore = None
+
+    def _enter_queue(self):
+        with self._lock:
+            if self._counters["waiting"] >= self.max_queue:
+                self._counters["rejected"] += 1
+                raise OverloadedError(self.name, f"{self.max_queue} calls already waiting")
+            self._counters["waiting"] += 1
+
+    def _leave_queue(self, admitted):
+        with self._lock:
+            self._counters["waiting"] -= 1
+            if admitted:
+                self._counters["active"] += 1
+            else:
+                self._counters["rejected"] += 1
+
+    def _no_slot(self):
+        return OverloadedError(self.name, f"no free slot within {self.queue_timeout}s", self.queue_timeout)
+
+    def _admit(self):
+        deadline = time.monotonic() + self.queue_timeout
+        self._enter_queue()
+        admitted = False
+        try:
+            admitted = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            self._leave_queue(admitted)
+        if not admitted:
+            raise self._no_slot()
+        return deadline
+
+    def _release(self):
+        with self._lock:
+            self._counters["active"] -= 1
+        self._slots.release()
+
+    def _rate_limited(self):
+        with self._lock:
+            self._counters["rejected"] += 1
+        return OverloadedError(self.name, "rate limit reached", 1 / self.bucket.rate)
+
+    def _count_call(self):
+        with self._lock:
+            self._counters["calls"] += 1
+
+    def _backoff(self, attempt, error):
+        """Seconds to wait before retrying `error`; re-raises when it should not be retried."""
+        if not is_retryable(error):
+            raise error
+        if attempt == self.max_retries:
+            with self._lock:
+                self._counters["failed"] += 1
+            # Still throttled or failing after backing off: tell the client to come back later
+            raise OverloadedError(self.name, f"upstream still failing after {attempt + 1} attempts: {error}",
+                                  self.max_delay) from error
+        with self._lock:
+            self._counters["retries"] += 1
+        # Full jitter keeps retrying callers from synchronising
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _attempt(self, deadline, fn, args, kwargs):
+        for attempt in range(self.max_retries + 1):
+            if not self.bucket.acquire(max(deadline, time.monotonic())):
+                raise self._rate_limited()
+            try:
+                self._count_call()
+                return fn(*args, **kwargs)
+            except Exception as e:
+                time.sleep(self._backoff(attempt, e))
+                # Retries wait for tokens on their own clock, not the queue deadline
+                deadline = time.monotonic() + self.queue_timeout
+
+    def call(self, fn, *args, **kwargs):
+        deadline = self._admit()
+        try:
+            return self._attempt(deadline, fn, args, kwargs)
+        finally:
+            self._release()
+
+    @contextmanager
+    def stream(self, fn, *args, **kwargs):
+        """Like call(), but the slot stays taken until the with-block ends (streamed responses)."""
+        deadline = self._admit()
+        try:
+            yield self._attempt(deadline, fn, args, kwargs)
+        finally:
+            self._release()
+
+    # ========== ⚡ ASYNC ==========
+    def _async_slots(self):
+        # asyncio primitives belong to one event loop; the async semaphore is
+        # separate from the thread one, so a process serving both modes can
+        # have up to twice max_concurrent calls in flight
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._async_semaphore
+
+    async def acall(self, fn, *args, **kwargs):
+        """await fn(*args, **kwargs) under the same limits as call()."""
+        slots = self._async_slots()
+        deadline = time.monotonic() + self.queue_timeout
+        self._enter_queue()
+        admitted = False
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+            admitted = True
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._leave_queue(admitted)
+        if not admitted:
+            raise self._no_slot()
+
+        try:
+            for attempt in range(self.max_retries + 1):
+                if not await self.bucket.acquire_async(max(deadline, time.monotonic())):
+                    raise self._rate_limited()
+                try:
+                    self._count_call()
+                    return await fn(*args, **kwargs)
+                except Exception as e:
+                    await asyncio.sleep(self._backoff(attempt, e))
+                    deadline = time.monotonic() + self.queue_timeout
+        finally:
+            with self._lock:
+                self._counters["active"] -= 1
+            slots.release()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "max_concurrent": self.max_concurrent,
+            "rate_per_second": self.bucket.rate,
+            "max_queue": self.max_queue,
+            "queue_timeout_seconds": self.queue_timeout,
+        }
+
+
+def _governor_from_env(name, **defaults):
+    prefix = f"OUTBOUND_{name.upper()}_"
+
+    def setting(key, cast):
+        value = os.environ.get(prefix + key.upper())
+        return cast(value) if value is not None else defaults[key]
+
+    return ProviderGovernor(
+        name,
+        max_concurrent=setting("max_concurrent", int),
+        rate=setting("rate", float),
+        max_queue=setting("max_queue", int),
+        queue_timeout=setting("queue_timeout", float),
+        max_retries=setting("max_retries", int),
+    )
+
+
+governors = {
+    "kindwise": _governor_from_env("kindwise", max_concurrent=8, rate=5.0, max_queue=64, queue_timeout=20.0,
+                                   max_retries=3),
+    "gemini": _governor_from_env("gemini", max_concurrent=16, rate=10.0, max_queue=128, queue_timeout=10.0,
+                                 max_retries=3),
+}
+
+
+def call(provider, fn, *args, **kwargs):
+    return governors[provider].call(fn, *args, **kwargs)
+
+
+def stream(provider, fn, *args, **kwargs):
+    return governors[provider].stream(fn, *args, **kwargs)
+
+
+async def acall(provider, fn, *args, **kwargs):
+    return await governors[provider].acall(fn, *args, **kwargs)
+
+
+def stats():
+    return {name: governor.stats() for name, governor in governors.items()}
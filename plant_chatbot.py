@@ -1,15 +1,25 @@
-from firebase_admin import credentials, firestore
-import google.generativeai as genai
 import os
+import threading
+from cachetools import TTLCache
+from chat_cache import ChatAnswerCache, plant_fingerprint
+import outbound
+from clients import db, genai
 
 # ========== 🔐 CONFIG SECTION ==========
-# Firebase Admin SDK setup
-cred = credentials.Certificate("./plantquest-8a4bd-firebase-adminsdk-fbsvc-ffc04c7186.json")  # 🔁 Replace with your actual path
-db = firestore.client()
+# Firestore and Gemini (configured with GEMINI_API) come from clients.py and
+# are set up on first use
+CHAT_MODEL = "gemini-2.0-flash-lite-001"
 
-# Gemini API setup
-genai.configure(api_key= os.environ.get('GEMINI_API'))  
-model = genai.GenerativeModel("gemini-2.0-flash-lite-001")
+# Chat sessions are kept per (user, plant) and expire after CHAT_SESSION_TTL
+# seconds without a message; only the last CHAT_HISTORY_TURNS question/answer
+# pairs are sent back to the model.
+CHAT_SESSION_TTL = int(os.environ.get("CHAT_SESSION_TTL", 1800))
+CHAT_HISTORY_TURNS = int(os.environ.get("CHAT_HISTORY_TURNS", 6))
+CHAT_MAX_SESSIONS = int(os.environ.get("CHAT_MAX_SESSIONS", 10000))
+
+# Answers to opening questions are shared across users and plants whose
+# persona fields are identical
+answer_cache = ChatAnswerCache(max_bytes=int(os.environ.get("CHAT_CACHE_MB", 32)) * 1024 * 1024)
 
 
 # ========== 🌿 GET PLANT DATA ==========
@@ -22,6 +32,18 @@ def get_plant_data(plant_id):
         return None
 
 
+# Everything create_plant_persona_context reads
+PERSONA_FIELDS = [
+    "common_name", "health_status", "health_score", "added_by",
+    "adopted_by", "last_watered", "location", "diseases",
+]
+
+
+def get_persona_data(plant_id):
+    doc = db.collection("Plants").document(plant_id).get(field_paths=PERSONA_FIELDS)
+    return doc.to_dict() if doc.exists else None
+
+
 # ========== 🧠 GENERATE PLANT CONTEXT ==========
 def create_plant_persona_context(plant_data):
     plant_name = plant_data.get("common_name", "a plant")
@@ -70,23 +92,134 @@ If someone asks something unrelated to plants or your care, respond:
 
 
 
-# ========== 💬 CHAT FUNCTION ==========
-def plant_chatbot(plant_id, user_question):
-    plant_data = get_plant_data(plant_id)
+# ========== 🗂️ CHAT SESSIONS ==========
+class PlantChatSession:
+    """A conversation with one plant: the persona is built once, as the model's system instruction."""
+
+    def __init__(self, plant_data):
+        self.history = []
+        # One message at a time per session so turns stay in order
+        self.lock = threading.Lock()
+        self.set_persona(plant_data)
+
+    def set_persona(self, plant_data):
+        self.fingerprint = plant_fingerprint(plant_data, PERSONA_FIELDS)
+        self.model = genai.GenerativeModel(CHAT_MODEL, system_instruction=create_plant_persona_context(plant_data))
+
+    def cache_key(self, question):
+        # Follow-up questions depend on the conversation, so only opening
+        # questions are answered from (and stored in) the cache
+        if self.history:
+            return None
+        return answer_cache.key_for(self.fingerprint, question)
+
+    def contents_for(self, question):
+        return self.history + [{"role": "user", "parts": [question]}]
+
+    def record(self, question, answer):
+        self.history += [{"role": "user", "parts": [question]}, {"role": "model", "parts": [answer]}]
+        del self.history[:-2 * CHAT_HISTORY_TURNS]
+
+
+chat_sessions = TTLCache(maxsize=CHAT_MAX_SESSIONS, ttl=CHAT_SESSION_TTL)
+chat_sessions_lock = threading.Lock()
+
+
+def get_chat_session(user_id, plant_id):
+    key = (user_id, plant_id)
+    # Only the persona fields are read, to notice when the plant has changed
+    plant_data = get_persona_data(plant_id)
     if not plant_data:
-        return "❌ Error: Plant not found in database."
+        end_chat_session(user_id, plant_id)
+        return None
+
+    with chat_sessions_lock:
+        session = chat_sessions.get(key)
+        if session is None:
+            session = PlantChatSession(plant_data)
+        elif session.fingerprint != plant_fingerprint(plant_data, PERSONA_FIELDS):
+            # The plant changed: same conversation, updated persona
+            session.set_persona(plant_data)
+        # Re-inserting restarts the TTL, so active conversations stay alive
+        chat_sessions[key] = session
+        return session
 
-    plant_context = create_plant_persona_context(plant_data)
 
-    # Initialize a new chat session
-    chat = model.start_chat()
+def end_chat_session(user_id, plant_id):
+    with chat_sessions_lock:
+        return chat_sessions.pop((user_id, plant_id), None) is not None
 
-    # Combine context and question into a single message
-    full_prompt = f"{plant_context}\n\n{user_question}"
 
-    # Send message
-    response = chat.send_message(full_prompt)
-    return response.text
+# ========== 💬 CHAT FUNCTION ==========
+def open_chat_session(plant_id, user_id=None):
+    if user_id:
+        return get_chat_session(user_id, plant_id)
+    # No user: a one-off question without history
+    plant_data = get_persona_data(plant_id)
+    return PlantChatSession(plant_data) if plant_data else None
+
+
+def plant_chatbot(plant_id, user_question, user_id=None):
+    session = open_chat_session(plant_id, user_id)
+    if session is None:
+        return "❌ Error: Plant not found in database."
+
+    with session.lock:
+        key = session.cache_key(user_question)
+        answer = answer_cache.get(key) if key else None
+        if answer is None:
+            # Only the recent history and the new question; the persona travels
+            # as the system instruction
+            response = outbound.call("gemini", session.model.generate_content, session.contents_for(user_question))
+            answer = response.text
+            if key:
+                answer_cache.put(key, answer)
+        session.record(user_question, answer)
+    return answer
+
+
+def stream_plant_answer(session, user_question):
+    """Yield the answer in chunks as Gemini generates it.
+
+    The exchange is added to the session history only once the answer is
+    complete; if the consumer stops early (client disconnected) the upstream
+    stream is cancelled and the history is left as it was.
+    """
+    with session.lock:
+        key = session.cache_key(user_question)
+        cached = answer_cache.get(key) if key else None
+        if cached is not None:
+            yield cached
+            session.record(user_question, cached)
+            return
+
+        # The Gemini slot stays taken for as long as the answer streams
+        with outbound.stream("gemini", session.model.generate_content, session.contents_for(user_question),
+                             stream=True) as response:
+            parts = []
+            completed = False
+            try:
+                for chunk in response:
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text (e.g. only a finish reason)
+                        continue
+                    if text:
+                        parts.append(text)
+                        yield text
+                completed = True
+            finally:
+                if completed:
+                    answer = "".join(parts)
+                    session.record(user_question, answer)
+                    if key:
+                        answer_cache.put(key, answer)
+                else:
+                    # Stop generation (and billing) on the gRPC stream if it is still open
+                    cancel = getattr(getattr(response, "_iterator", None), "cancel", None)
+                    if cancel:
+                        cancel()
 
 
 
@@ -0,0 +1,135 @@
+import math
+import threading
+import numpy as np
+
+# In-process columnar cache of plant coordinates.
+# Plant IDs and lat/lng live in contiguous NumPy arrays that a Firestore
+# on_snapshot listener keeps in sync, so radius queries are one vectorized
+# haversine pass over memory instead of a database round trip.
+
+EARTH_RADIUS_M = 6371008.8
+
+
+class PlantCoordsCache:
+    def __init__(self, collection):
+        self._collection = collection
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._watch = None
+        self._index = {}
+        # (ids, lat_rad, lng_rad, cos_lat) — replaced wholesale, never mutated
+        self._snapshot = (np.empty(0, dtype=object), np.empty(0), np.empty(0), np.empty(0))
+
+    # ========== 🔄 LISTENER ==========
+    def start(self):
+        with self._lock:
+            if self._watch is None:
+                self._watch = self._collection.on_snapshot(self._on_snapshot)
+
+    def stop(self):
+        with self._lock:
+            if self._watch is not None:
+                self._watch.unsubscribe()
+                self._watch = None
+                self._ready.clear()
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def __len__(self):
+        return len(self._snapshot[0])
+
+    def _on_snapshot(self, doc_snapshots, changes, read_time):
+        try:
+            self._apply_changes(changes)
+        except Exception as e:
+            print(f"Error applying plant coordinate changes: {e}")
+        self._ready.set()
+
+    def _apply_changes(self, changes):
+        with self._lock:
+            ids, lat, lng, _ = self._snapshot
+            ids, lat, lng = ids.copy(), lat.copy(), lng.copy()
+            added_ids, added_lat, added_lng = [], [], []
+            removed_rows = []
+            dirty = False
+
+            for change in changes:
+                plant_id = change.document.id
+                kind = change.type.name
+                row = self._index.get(plant_id)
+
+                if kind == "REMOVED":
+                    if row is not None:
+                        removed_rows.append(row)
+                        dirty = True
+                    continue
+
+                coords = _coords_radians(change.document.to_dict())
+                if coords is None:
+                    if row is not None:
+                        removed_rows.append(row)
+                        dirty = True
+                    continue
+
+                if row is None:
+                    added_ids.append(plant_id)
+                    added_lat.append(coords[0])
+                    added_lng.append(coords[1])
+                    dirty = True
+                elif lat[row] != coords[0] or lng[row] != coords[1]:
+                    lat[row], lng[row] = coords
+                    dirty = True
+
+            if not dirty:
+                return
+
+            if removed_rows:
+                keep = np.ones(len(ids), dtype=bool)
+                keep[removed_rows] = False
+                ids, lat, lng = ids[keep], lat[keep], lng[keep]
+            if added_ids:
+                ids = np.concatenate([ids, np.array(added_ids, dtype=object)])
+                lat = np.concatenate([lat, np.array(added_lat)])
+                lng = np.concatenate([lng, np.array(added_lng)])
+
+            if removed_rows or added_ids:
+                self._index = {plant_id: i for i, plant_id in enumerate(ids)}
+            self._snapshot = (ids, lat, lng, np.cos(lat))
+
+    # ========== 📍 QUERIES ==========
+    def query_radius(self, lat, lng, radius_m, k=None):
+        """Return [(plant_id, distance_m)] within `radius_m`, nearest first, at most `k`."""
+        ids, lat_r, lng_r, cos_lat = self._snapshot
+        if not len(ids):
+            return []
+
+        p_lat = math.radians(lat)
+        p_lng = math.radians(lng)
+
+        # Cheap latitude band prefilter before the trig-heavy pass
+        band = np.flatnonzero(np.abs(lat_r - p_lat) <= radius_m / EARTH_RADIUS_M)
+        if not len(band):
+            return []
+
+        d_lat = lat_r[band] - p_lat
+        d_lng = lng_r[band] - p_lng
+        a = np.sin(d_lat / 2) ** 2 + math.cos(p_lat) * cos_lat[band] * np.sin(d_lng / 2) ** 2
+        dist = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+        hits = np.flatnonzero(dist <= radius_m)
+        if k is not None and len(hits) > k:
+            hits = hits[np.argpartition(dist[hits], k - 1)[:k]]
+        hits = hits[np.argsort(dist[hits], kind="stable")]
+
+        return [(ids[band[i]], float(dist[i])) for i in hits]
+
+
+def _coords_radians(data):
+    location = (data or {}).get("location") or {}
+    if location.get("lat") is None or location.get("lng") is None:
+        return None
+    return math.radians(float(location["lat"])), math.radians(float(location["lng"]))
@@ -1,28 +1,57 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, make_response
+import json
 import os
 import uuid
 import base64
-from firebase_admin import firestore
-from kindwise import PlantApi
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import pytz
 from datetime import timedelta, datetime
-from PIL import Image
-import imagehash
+from PIL import Image, UnidentifiedImageError
 from io import BytesIO
 import base64
-from check import video_contains_plant, save_first_frame
-from plant_chatbot import plant_chatbot
+from plant_chatbot import plant_chatbot, end_chat_session, open_chat_session, stream_plant_answer, answer_cache
+import geo_index
+import quest_generation
+import quest_schedule
+import eco_points
+import image_hashes
+from image_hashes import PlantHashIndex
+import image_store
+from analysis_cache import AnalysisCache
+from jobs import job_queue, QueueFullError
+import outbound
+from outbound import OverloadedError
+from video_pool import VideoVerifierPool, VideoVerificationError, VideoTimeoutError, VideoMemoryError
+import clients
+from clients import db, firestore, plant_api, KINDWISE_TIMEOUT
 
 plant_routes = Blueprint("plant_routes", __name__)
-db = firestore.client()
-plant_api = PlantApi(os.environ.get('PLANT_API'))
-
-
-
-
-def compress_and_encode_image(base64_string, max_size=(512, 512), quality=70):
-    # Decode base64 to image
-    image_data = base64.b64decode(base64_string)
+KINDWISE_MAX_WORKERS = int(os.environ.get("KINDWISE_MAX_WORKERS", 8))
+kindwise_executor = ThreadPoolExecutor(max_workers=KINDWISE_MAX_WORKERS, thread_name_prefix="kindwise")
+JOB_SPOOL_DIR = os.environ.get("JOB_SPOOL_DIR", "./job_spool")
+os.makedirs(JOB_SPOOL_DIR, exist_ok=True)
+analysis_cache = AnalysisCache(
+    maxsize=int(os.environ.get("ANALYSIS_CACHE_SIZE", 1024)),
+    ttl=int(os.environ.get("ANALYSIS_CACHE_TTL", 86400)),
+    disk_dir=os.environ.get("ANALYSIS_CACHE_DIR")
+)
+video_verifier = VideoVerifierPool(
+    max_workers=int(os.environ.get("VIDEO_WORKERS", 2)),
+    timeout=float(os.environ.get("VIDEO_TIMEOUT", 60)),
+    memory_limit_mb=int(os.environ.get("VIDEO_MEMORY_MB", 2048))
+)
+QUEST_WRITE_WORKERS = int(os.environ.get("QUEST_WRITE_WORKERS", 4))
+hash_index = clients.lazy("plant_hash_index", lambda: PlantHashIndex(db.collection("Plants")))
+plant_images = clients.lazy("image_store", image_store.get_image_store)
+# Starts the forkserver (which imports check/cv2) before the first video arrives
+clients.lazy("video_forkserver", video_verifier.warm_up)
+
+
+
+
+def compress_image_bytes(image_data, max_size=(512, 512), quality=70):
     image = Image.open(BytesIO(image_data))
 
     # Convert to RGB to avoid mode errors (e.g., from PNG)
@@ -35,9 +64,11 @@ def compress_and_encode_image(base64_string, max_size=(512, 512), quality=70):
     # Save to BytesIO with reduced quality
     buffer = BytesIO()
     image.save(buffer, format="JPEG", quality=quality, optimize=True)
-    compressed_bytes = buffer.getvalue()
+    return buffer.getvalue()
+
 
-    # Encode to base64 again
+def compress_and_encode_image(base64_string, max_size=(512, 512), quality=70):
+    compressed_bytes = compress_image_bytes(base64.b64decode(base64_string), max_size, quality)
     return base64.b64encode(compressed_bytes).decode("utf-8")
 
 
@@ -47,76 +78,153 @@ def encode_image_base64(image_path):
         return base64.b64encode(img_file.read()).decode('utf-8')
 
 
-def is_similar_image(image_path, existing_base64, threshold=5):
-    new_hash = imagehash.average_hash(Image.open(image_path))
-    existing_image_data = base64.b64decode(existing_base64)
-    with open("temp_compare.jpg", "wb") as f:
-        f.write(existing_image_data)
-    existing_hash = imagehash.average_hash(Image.open("temp_compare.jpg"))
-    os.remove("temp_compare.jpg")
-    return abs(new_hash - existing_hash) <= threshold
+def stored_image_hash(plant, algorithm):
+    hashes = plant.get("image_hashes") or {}
+    if algorithm in hashes:
+        return hashes[algorithm]
+    # Plant registered before hashes were stored; hash its image in memory
+    image_data = None
+    if plant.get("image_digest"):
+        image_data = plant_images.get(plant["image_digest"])
+    elif plant.get("image_base64"):
+        image_data = base64.b64decode(plant["image_base64"])
+    if image_data:
+        return image_hashes.hash_image(Image.open(BytesIO(image_data)), algorithm)
+    return None
+
+
+def find_duplicate(hashes, species, nearby, threshold=image_hashes.DUPLICATE_THRESHOLD):
+    same_species = [p for p in nearby if p.get("species", "").lower() == species.lower()]
+    if not same_species:
+        return None
+
+    hash_index.start()
+    indexed = hash_index.is_ready()
+    matches = hash_index.search(hashes, threshold) if indexed else {}
+
+    for plant in same_species:
+        if plant["id"] in matches:
+            return plant
+        if indexed and hash_index.has(plant["id"]):
+            continue
+        existing = stored_image_hash(plant, hash_index.algorithm)
+        if existing and image_hashes.hamming(hashes[hash_index.algorithm], existing) <= threshold:
+            return plant
+    return None
+
+
+def get_nearby_plants(lat, lng, radius_m=4):
+    candidates = []
+    for plant, data, _ in geo_index.query_within(db.collection("Plants"), lat, lng, radius_m):
+        candidates.append({"id": plant.id, **data})
+    return candidates
 
 
-def get_nearby_plants(lat, lng, radius_deg=0.00003):
-    lower_lat = lat - radius_deg
-    upper_lat = lat + radius_deg
-    lower_lng = lng - radius_deg
-    upper_lng = lng + radius_deg
+def summarize_identification(identification):
+    if not identification.result.is_plant.binary:
+        return {"is_plant": False, "error": "It  doesn't appear to be a plant."}
+
+    suggestions = [
+        {
+            "name": s.name,
+            "probability": s.probability,
+            "common_names": s.details.get("common_names", []),
+            "url": s.details.get("url", "")
+        }
+        for s in identification.result.classification.suggestions
+    ]
+    return {"is_plant": True, "suggestions": suggestions}
 
-    nearby = db.collection("Plants").where("location.lat", ">=", lower_lat).where("location.lat", "<=", upper_lat).stream()
-    candidates = []
-    for plant in nearby:
-        data = plant.to_dict()
-        if lower_lng <= data["location"]["lng"] <= upper_lng:
-            candidates.append({"id": plant.id, **data})
-    return candidates
 
+def summarize_health(health):
+    is_healthy = health.result.is_healthy.binary
+    health_score = 9.0 if is_healthy else 5.0
+
+    diseases_raw = [
+        {
+            "name": d.name,
+            "probability": d.probability,
+            "description": d.details.get("description"),
+            "treatment": d.details.get("treatment")
+        }
+        for d in health.result.disease.suggestions
+    ]
+
+    diseases = sorted(diseases_raw, key=lambda d: d.get("probability", 0), reverse=True)[:2]
+
+    return {
+        "health_status": "healthy" if is_healthy else "diseased",
+        "health_score": health_score,
+        "diseases": diseases
+    }
+
+
+def health_unavailable(error):
+    print(f"Health assessment failed, returning identification only: {error}")
+    return {"health_status": "unknown", "diseases": [], "health_error": error}
+
+
+def analyze_plant(image):
+    # `image` is a file path or raw image bytes; KindWise accepts either.
+    # Identification and health assessment run concurrently on the shared
+    # executor; a failed health call still returns the identification.
+    deadline = time.monotonic() + KINDWISE_TIMEOUT
+    # Both calls go through the KindWise governor (concurrency, rate, retries)
+    identify_future = kindwise_executor.submit(outbound.call, "kindwise", plant_api.identify, image,
+                                               details=['url', 'common_names'])
+    health_future = kindwise_executor.submit(outbound.call, "kindwise", plant_api.health_assessment, image,
+                                             details=["description", "treatment"])
 
-def analyze_plant(image_path):
     try:
-        result = {}
-        identification = plant_api.identify(image_path, details=['url', 'common_names'])
-        if not identification.result.is_plant.binary:
-            return {"is_plant": False, "error": "It  doesn't appear to be a plant."}
-
-        suggestions = [
-            {
-                "name": s.name,
-                "probability": s.probability,
-                "common_names": s.details.get("common_names", []),
-                "url": s.details.get("url", "")
-            }
-            for s in identification.result.classification.suggestions
-        ]
-
-        health = plant_api.health_assessment(image_path, details=["description", "treatment"])
-        is_healthy = health.result.is_healthy.binary
-        health_score = 9.0 if is_healthy else 5.0
-
-        diseases_raw = [
-            {
-                "name": d.name,
-                "probability": d.probability,
-                "description": d.details.get("description"),
-                "treatment": d.details.get("treatment")
-            }
-            for d in health.result.disease.suggestions
-        ]
-
-        diseases = sorted(diseases_raw, key=lambda d: d.get("probability", 0), reverse=True)[:2]
-
-        result["is_plant"] = True
-        result["suggestions"] = suggestions
-        result["health_status"] = "healthy" if is_healthy else "diseased"
-        result["health_score"] = health_score
-        result["diseases"] = diseases
+        try:
+            identification = identify_future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            raise TimeoutError("Plant identification timed out")
+
+        result = summarize_identification(identification)
+        if not result["is_plant"]:
+            health_future.cancel()
+            return result
 
+        try:
+            health = health_future.result(timeout=max(0, deadline - time.monotonic()))
+        except Exception as e:
+            result.update(health_unavailable("Health assessment timed out" if isinstance(e, FutureTimeoutError) else str(e)))
+            return result
+
+        result.update(summarize_health(health))
         return result
 
+    except OverloadedError:
+        # Not a verdict on the image: let the caller answer 503
+        health_future.cancel()
+        raise
     except Exception as e:
+        health_future.cancel()
         return {"is_plant": False, "error": str(e)}
 
 
+def overloaded_response(error, message="The service is busy, try again later."):
+    response = make_response(jsonify({"success": False, "error": message, "retry_after": error.retry_after}), 503)
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+
+def is_complete_analysis(analysis):
+    # Errors and partial results (failed health call) are retried, not cached
+    return analysis.get("is_plant", False) and "health_error" not in analysis
+
+
+def analyze_plant_cached(image_bytes, image=None):
+    """analyze_plant through the analysis cache; `image_bytes` must be the compressed image."""
+    key = AnalysisCache.key_for(image_bytes)
+    return analysis_cache.get_or_compute(
+        key,
+        lambda: analyze_plant(image_bytes if image is None else image),
+        cacheable=is_complete_analysis
+    )
+
+
 @plant_routes.route('/chatbot', methods=['POST'])
 def chatbot():
     try:
@@ -127,12 +235,17 @@ def chatbot():
 
         plant_id = data.get('plant_id')
         question = data.get('question')
+        # Optional: with a user_id the conversation keeps its history
+        user_id = data.get('user_id')
 
         if not plant_id or not question:
             return jsonify({"success": False, "error": "Missing 'plant_id' or 'question'"}), 400
 
         # Call the chatbot logic
-        answer = plant_chatbot(plant_id, question)
+        try:
+            answer = plant_chatbot(plant_id, question, user_id)
+        except OverloadedError as e:
+            return overloaded_response(e, "The plant is busy answering others, try again shortly.")
 
         return jsonify({
             "success": True,
@@ -149,93 +262,70 @@ def chatbot():
 
 
 
+@plant_routes.route('/chatbot/stream', methods=['POST'])
+def chatbot_stream():
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"success": False, "error": "Missing JSON body"}), 400
+
+    plant_id = data.get('plant_id')
+    question = data.get('question')
+    user_id = data.get('user_id')
+    if not plant_id or not question:
+        return jsonify({"success": False, "error": "Missing 'plant_id' or 'question'"}), 400
+
+    session = open_chat_session(plant_id, user_id)
+    if session is None:
+        return jsonify({"success": False, "error": "Plant not found"}), 404
+
+    def events():
+        # Sent straight away so the client gets headers before the model answers
+        yield ": stream open\n\n"
+        answer = []
+        try:
+            for text in stream_plant_answer(session, question):
+                answer.append(text)
+                yield f"event: chunk\ndata: {json.dumps({'text': text})}\n\n"
+        except OverloadedError as e:
+            yield f"event: error\ndata: {json.dumps({'success': False, 'error': str(e), 'retry_after': e.retry_after})}\n\n"
+            return
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'success': False, 'error': str(e)})}\n\n"
+            return
+        yield f"event: done\ndata: {json.dumps({'success': True, 'plant_id': plant_id, 'answer': ''.join(answer)})}\n\n"
+
+    # When the client disconnects the server closes this generator, which
+    # closes stream_plant_answer and cancels the Gemini request
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@plant_routes.route('/chatbot/session', methods=['DELETE'])
+def end_chatbot_session():
+    data = request.get_json(silent=True) or {}
+    plant_id = data.get('plant_id')
+    user_id = data.get('user_id')
+    if not plant_id or not user_id:
+        return jsonify({"success": False, "error": "Missing 'plant_id' or 'user_id'"}), 400
+    return jsonify({"success": True, "ended": end_chat_session(user_id, plant_id)}), 200
+
+
+
 @plant_routes.route('/generate_quests', methods=['POST'])
 def generate_quests():
     now = datetime.now(pytz.UTC)
     today_start = datetime.combine(now.date(), datetime.min.time()).replace(tzinfo=pytz.UTC)
 
-    plants_ref = db.collection("Plants")
-    quests_ref = db.collection("Quests")
-    users_ref = db.collection("Users")
-
-    created_quests = []
-
-    plants = plants_ref.stream()
-    for plant_doc in plants:
-        plant = plant_doc.to_dict()
-        plant_id = plant_doc.id
-        adopted_by = plant.get("adopted_by")
-        last_watered = plant.get("last_watered")
-
-        quest_types = {
-            "Water Plant": {"frequency_days": 1},
-            "Health Assessment": {"frequency_days": 3},
-            "Growth Report": {"frequency_days": 3},
-            "Photo Submission": {"frequency_days": 7}
-        }
+    created_quests, failures = quest_generation.generate_all_due(db, now, QUEST_WRITE_WORKERS)
 
-        for quest_type, config in quest_types.items():
-            frequency = timedelta(days=config["frequency_days"])
-            existing_quests = quests_ref \
-                .where("plant_id", "==", plant_id) \
-                .where("type", "==", quest_type) \
-                .order_by("created_at", direction=firestore.Query.DESCENDING) \
-                .limit(1) \
-                .stream()
-
-            should_create = True
-            for quest_doc in existing_quests:
-                last_created = quest_doc.to_dict().get("created_at")
-                if last_created and (now - last_created.replace(tzinfo=pytz.UTC) < frequency):
-                    should_create = False
-                    break
-
-            if should_create:
-                quest_data = {
-                    "assigned_to": adopted_by or "",
-                    "created_at": now,
-                    "plant_id": plant_id,
-                    "proof_submission": {},
-                    "photo_url": None,
-                    "verified": False,
-                    "reward_points": 50,
-                    "status": "pending",
-                    "type": quest_type
-                }
-                quest_ref = quests_ref.document()
-                quest_ref.set(quest_data)
-                created_quests.append(quest_ref.id)
-
-                
-                try:
-                    plants_ref.document(plant_id).update({
-                        "quests": firestore.ArrayUnion([quest_ref.id])
-                    })
-                except Exception as e:
-                    print(f"Error adding quest to plant {plant_id}: {e}")
-
-                
-                if adopted_by:
-                    try:
-                        if quest_type == "Water Plant":
-                            if last_watered:
-                                watered_time = last_watered.replace(tzinfo=pytz.UTC)
-                                if now - watered_time >= timedelta(days=1):
-                                    users_ref.document(adopted_by).update({
-                                        "active_quests": firestore.ArrayUnion([quest_ref.id])
-                                    })
-                        else:
-                            users_ref.document(adopted_by).update({
-                                "active_quests": firestore.ArrayUnion([quest_ref.id])
-                            })
-                    except Exception as e:
-                        print(f"Error updating active_quests for user {adopted_by}: {e}")
-
-    return jsonify({
+    response = {
         "status": "success",
         "quests_created": len(created_quests),
         "quest_ids": created_quests
-    }), 200
+    }
+    if failures:
+        response["failed"] = failures
+    return jsonify(response), 200
 
 @plant_routes.route('/api/check-health', methods=['POST'])
 def check_health():
@@ -245,7 +335,16 @@ def check_health():
     if not image_path or not os.path.exists(image_path):
         return jsonify({"success": False, "error": "Invalid image path"}), 400
 
-    analysis = analyze_plant(image_path)
+    try:
+        with open(image_path, "rb") as f:
+            image_bytes = compress_image_bytes(f.read())
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        return jsonify({"success": False, "error": "File is not a readable image"}), 400
+
+    try:
+        analysis = analyze_plant_cached(image_bytes, image_path)
+    except OverloadedError as e:
+        return overloaded_response(e, "Plant analysis is busy, try again later.")
     if not analysis.get("is_plant", False):
         return jsonify({"success": False, "error": analysis.get("error", "Not a valid plant image")}), 400
 
@@ -260,48 +359,103 @@ def register_plant():
     lng = float(data.get("lng"))
     original_base64 = data.get("image_base64")
     video = request.files.get("video")
+    run_async = request.args.get("async", data.get("async", "")).lower() in ("1", "true", "yes")
     print(user_id,lat,lng)
+
+    video_path = None
     if video:
-        video_path = f"temp_video_{uuid.uuid4().hex[:6]}.mp4"
+        # OpenCV needs a real path; use a unique file so concurrent uploads never collide.
+        # Async jobs keep theirs in the durable spool directory until a worker picks it up.
+        fd, video_path = tempfile.mkstemp(suffix=".mp4", prefix="plantquest_",
+                                          dir=JOB_SPOOL_DIR if run_async else None)
+        os.close(fd)
         video.save(video_path)
-        print(video_path)
-        result = video_contains_plant(video_path)
-        if not result:
-            os.remove(video_path)
-            return jsonify({"success": False, "error": "No plant detected in the video."}), 400
 
+    if run_async:
         try:
-            saved_path = save_first_frame(video_path, "extracted_frame.png", "png")
-            print(f"First frame saved to: {saved_path}")
-            # Use the extracted frame for image_base64 if original was not provided
-            with open(saved_path, "rb") as f:
-                frame_data = f.read()
-                original_base64 = base64.b64encode(frame_data).decode()
-            os.remove(saved_path)
-        except Exception as e:
+            job_id = job_queue.submit("register_plant", {
+                "user_id": user_id,
+                "lat": lat,
+                "lng": lng,
+                "image_base64": original_base64,
+                "video_path": video_path
+            })
+        except QueueFullError as e:
+            if video_path:
+                os.remove(video_path)
+            print(f"Rejecting async registration: {e}")
+            return jsonify({"success": False, "error": "Registration queue is full, try again later."}), 503
+
+        return jsonify({
+            "success": True,
+            "job_id": job_id,
+            "status_url": f"/jobs/{job_id}",
+            "events_url": f"/jobs/{job_id}/events"
+        }), 202
+
+    try:
+        original_bytes = base64.b64decode(original_base64) if original_base64 else None
+        result, status = register_plant_pipeline(user_id, lat, lng, original_bytes, video_path)
+    finally:
+        if video_path:
             os.remove(video_path)
-            return jsonify({"success": False, "error": f"Failed to extract frame: {str(e)}"}), 500
+    response = make_response(jsonify(result), status)
+    if "retry_after" in result:
+        response.headers["Retry-After"] = str(result["retry_after"])
+    return response
 
-        os.remove(video_path)
 
-    if not original_base64:
-        return jsonify({"success": False, "error": "Image missing"}), 400
+def run_register_plant_job(payload, progress):
+    video_path = payload.get("video_path")
+    try:
+        if video_path and not os.path.exists(video_path):
+            return {"success": False, "error": "Uploaded video is no longer available."}, 500
+        original_base64 = payload.get("image_base64")
+        original_bytes = base64.b64decode(original_base64) if original_base64 else None
+        return register_plant_pipeline(payload["user_id"], payload["lat"], payload["lng"],
+                                       original_bytes, video_path, progress)
+    finally:
+        if video_path and os.path.exists(video_path):
+            os.remove(video_path)
 
-    # Now continue with image-based analysis
-    image_base64 = compress_and_encode_image(original_base64)
 
-    if not all([user_id, lat, lng, image_base64]):
-        return jsonify({"success": False, "error": "Missing or invalid fields"}), 400
+job_queue.register("register_plant", run_register_plant_job)
+
+
+def register_plant_pipeline(user_id, lat, lng, original_bytes=None, video_path=None, progress=lambda stage: None):
+    """Run plant registration; returns (response_body, http_status). The caller owns `video_path`."""
+    if video_path:
+        progress("verifying_video")
+        # The sampled frame that best shows the plant, straight from the verification pass
+        try:
+            original_bytes = video_verifier.best_plant_frame(video_path)
+        except (VideoTimeoutError, VideoMemoryError) as e:
+            return {"success": False, "error": f"Video is too large or long to process: {str(e)}"}, 413
+        except VideoVerificationError as e:
+            return {"success": False, "error": f"Could not process video: {str(e)}"}, 400
+        if original_bytes is None:
+            return {"success": False, "error": "No plant detected in the video."}, 400
+
+    if not original_bytes:
+        return {"success": False, "error": "Image missing"}, 400
 
-    # Save base64 image temporarily for processing
-    temp_image_path = "temp_uploaded.jpg"
-    with open(temp_image_path, "wb") as f:
-        f.write(base64.b64decode(image_base64))
+    # Now continue with image-based analysis
+    progress("compressing")
+    try:
+        image_bytes = compress_image_bytes(original_bytes)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        return {"success": False, "error": "Image is not a readable image"}, 400
+
+    if not all([user_id, lat, lng, image_bytes]):
+        return {"success": False, "error": "Missing or invalid fields"}, 400
 
-    analysis = analyze_plant(temp_image_path)
+    progress("analyzing")
+    try:
+        analysis = analyze_plant_cached(image_bytes)
+    except OverloadedError as e:
+        return {"success": False, "error": "Plant analysis is busy, try again later.", "retry_after": e.retry_after}, 503
     if not analysis.get("is_plant", False):
-        os.remove(temp_image_path)
-        return jsonify({"success": False, "error": analysis.get("error")}), 400
+        return {"success": False, "error": analysis.get("error")}, 400
 
     species = analysis["suggestions"][0]["name"] if analysis["suggestions"] else "Unknown"
     common_name = analysis["suggestions"][0].get("common_names", ["Unknown"])[0]
@@ -309,43 +463,52 @@ def register_plant():
     diseases = analysis.get("diseases", [])
     health_status = analysis.get("health_status", "unknown")
 
+    progress("checking_duplicates")
+    hashes = image_hashes.compute_hashes(Image.open(BytesIO(image_bytes)))
     nearby = get_nearby_plants(lat, lng)
 
-    for existing in nearby:
-        if existing.get("species", "").lower() == species.lower():
-            if "image_base64" in existing and is_similar_image(image_base64, existing["image_base64"]):
-                os.remove(temp_image_path)
-                return jsonify({
-                    "success": False,
-                    "error": f"Duplicate plant detected nearby (Species: {species})."
-                }), 409
+    if find_duplicate(hashes, species, nearby):
+        return {
+            "success": False,
+            "error": f"Duplicate plant detected nearby (Species: {species})."
+        }, 409
+
+    progress("saving")
+    digest = image_store.store_image(plant_images, image_bytes)
 
     plant_id = f"plant_{uuid.uuid4().hex[:8]}"
     db.collection("Plants").document(plant_id).set({
         "species": species,
         "common_name": common_name,
         "location": {"lat": lat, "lng": lng},
+        "geohash": geo_index.encode(lat, lng),
         "health_score": health_score,
         "health_status": health_status,
         "last_watered": None,
         "adopted_by": None,
         "quests": [],
         "added_by": user_id,
-        "image_base64": image_base64,
+        "image_digest": digest,
+        "image_hashes": hashes,
         "registered_date": firestore.SERVER_TIMESTAMP,
         "diseases": diseases
     })
 
-    db.collection("Users").document(user_id).update({
-        "added_plants": firestore.ArrayUnion([plant_id]),
-        "eco_points": firestore.Increment(100)
-    })
+    hash_index.add(plant_id, hashes)
+
+    # Quest schedule plus the user's points and plant list (via a shard) in one commit
+    batch = db.batch()
+    for entry_ref, entry in quest_schedule.new_plant_schedule(db, plant_id):
+        batch.set(entry_ref, entry)
+    eco_points.award(batch, user_id, 100, added_plants=[plant_id])
+    batch.commit()
 
     photo_id = f"photo_{uuid.uuid4().hex[:8]}"
     db.collection("Photos").document(photo_id).set({
         "user_id": user_id,
         "plant_id": plant_id,
-        "image_url": None,  # You can store a URL if image is uploaded to cloud
+        "image_url": f"/plants/{plant_id}/image",
+        "image_digest": digest,
         "ai_analysis": {
             "species": species,
             "health_status": health_status,
@@ -354,15 +517,78 @@ def register_plant():
         "timestamp": firestore.SERVER_TIMESTAMP
     })
 
-    os.remove(temp_image_path)
-
-    return jsonify({
+    return {
         "success": True,
         "plant_id": plant_id,
         "message": f"Plant {species} ({common_name}) successfully registered.",
         "eco_points_earned": 100,
         "analysis": analysis
-    }), 201
+    }, 201
+
+
+
+
+@plant_routes.route('/plants/<plant_id>/image', methods=['GET'])
+def plant_image(plant_id):
+    size = request.args.get("size", "medium")
+    if size not in image_store.VARIANTS and size != image_store.ORIGINAL:
+        return jsonify({"success": False, "error": f"Unknown size '{size}'"}), 400
+
+    plant = db.collection("Plants").document(plant_id).get(field_paths=["image_digest"])
+    digest = plant.to_dict().get("image_digest") if plant.exists else None
+    if not digest:
+        return jsonify({"success": False, "error": "Image not found"}), 404
+
+    # Content-addressed: the digest and size fully determine the bytes
+    etag = f"{digest}-{size}"
+    if request.if_none_match.contains(etag):
+        response = make_response("", 304)
+    else:
+        image_data = plant_images.get(digest, size)
+        if image_data is None:
+            return jsonify({"success": False, "error": "Image not found"}), 404
+        response = make_response(image_data)
+        response.mimetype = "image/jpeg"
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    return response
+
+
+@plant_routes.route('/api/analysis-cache/stats', methods=['GET'])
+def analysis_cache_stats():
+    return jsonify(analysis_cache.stats())
+
+
+@plant_routes.route('/api/chat-cache/stats', methods=['GET'])
+def chat_cache_stats():
+    return jsonify(answer_cache.stats())
+
+
+@plant_routes.route('/api/outbound/stats', methods=['GET'])
+def outbound_stats():
+    return jsonify(outbound.stats())
+
+
+@plant_routes.route('/api/video-verifier/stats', methods=['GET'])
+def video_verifier_stats():
+    return jsonify(video_verifier.stats())
+
+
+@plant_routes.route('/api/eco-points/stats', methods=['GET'])
+def eco_points_stats():
+    return jsonify(eco_points.rollup.stats())
+
+
+@plant_routes.route('/api/startup/stats', methods=['GET'])
+def startup_stats():
+    return jsonify(clients.startup_report())
+
+
+@plant_routes.route('/api/warm-up', methods=['POST'])
+def warm_up():
+    failed = clients.warm_up()
+    return jsonify({"success": not failed, "failed": failed, "startup": clients.startup_report()}), 200 if not failed else 503
 
 
 @plant_routes.route('/api/health', methods=['GET'])
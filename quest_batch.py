@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+from clients import firestore
+
+# Batched commits for newly generated quests.
+# Each pending quest is a quest document plus the ArrayUnion updates that link
+# it to its plant and (optionally) its user, the schedule advance that must
+# land with it, and any extra merge-writes (e.g. feed entries). Quests are
+# packed into WriteBatches of at most MAX_BATCH_WRITES writes and committed
+# with bounded parallelism. A quest is never written without its schedule
+# advance, so a quest that exists is never due again.
+
+MAX_BATCH_WRITES = 500
+DEFAULT_MAX_WORKERS = 4
+
+
+def pending_quest(quest_ref, quest_data, plant_ref, user_ref=None, schedule_write=None, extra_writes=None):
+    """Describe one quest to create.
+
+    `schedule_write` is the (doc_ref, data, option) schedule advance (see
+    quest_schedule.after_quest_created); `extra_writes` is a list of
+    (doc_ref, data) merge-sets.
+    """
+    return {
+        "quest_ref": quest_ref,
+        "quest_data": quest_data,
+        "plant_ref": plant_ref,
+        "user_ref": user_ref,
+        "schedule_write": schedule_write,
+        "extra_writes": extra_writes or [],
+    }
+
+
+def _write_count(item):
+    return (2 + (1 if item["user_ref"] is not None else 0) + (1 if item["schedule_write"] is not None else 0)
+            + len(item["extra_writes"]))
+
+
+def _add_core_writes(batch, item):
+    # The quest, its schedule advance and feed entries land together or not at all
+    batch.set(item["quest_ref"], item["quest_data"])
+    if item["schedule_write"] is not None:
+        doc_ref, data, option = item["schedule_write"]
+        if option is not None:
+            batch.update(doc_ref, data, option=option)
+        else:
+            batch.set(doc_ref, data, merge=True)
+    for doc_ref, data in item["extra_writes"]:
+        batch.set(doc_ref, data, merge=True)
+
+
+def _add_to_batch(batch, item):
+    quest_id = item["quest_ref"].id
+    _add_core_writes(batch, item)
+    batch.update(item["plant_ref"], {"quests": firestore.ArrayUnion([quest_id])})
+    if item["user_ref"] is not None:
+        batch.update(item["user_ref"], {"active_quests": firestore.ArrayUnion([quest_id])})
+
+
+def _chunk(items):
+    chunk, writes = [], 0
+    for item in items:
+        count = _write_count(item)
+        if chunk and writes + count > MAX_BATCH_WRITES:
+            yield chunk
+            chunk, writes = [], 0
+        chunk.append(item)
+        writes += count
+    if chunk:
+        yield chunk
+
+
+def _commit_one(db, item):
+    # Fallback when a batch is rejected: the quest and its schedule advance
+    # commit together (a stale schedule entry fails both); the plant and user
+    # links stay best-effort, as in the original sequential writes
+    quest_ref = item["quest_ref"]
+    batch = db.batch()
+    _add_core_writes(batch, item)
+    batch.commit()
+
+    try:
+        item["plant_ref"].update({"quests": firestore.ArrayUnion([quest_ref.id])})
+    except Exception as e:
+        print(f"Error adding quest to plant {item['plant_ref'].id}: {e}")
+
+    if item["user_ref"] is not None:
+        try:
+            item["user_ref"].update({"active_quests": firestore.ArrayUnion([quest_ref.id])})
+        except Exception as e:
+            print(f"Error updating active_quests for user {item['user_ref'].id}: {e}")
+
+
+def _commit_chunk(db, chunk):
+    created, failures = [], []
+    batch = db.batch()
+    for item in chunk:
+        _add_to_batch(batch, item)
+    try:
+        batch.commit()
+        return [item["quest_ref"].id for item in chunk], failures
+    except Exception as e:
+        print(f"Batch of {len(chunk)} quests failed ({e}); retrying individually")
+
+    for item in chunk:
+        try:
+            _commit_one(db, item)
+            created.append(item["quest_ref"].id)
+        except Exception as e:
+            failures.append({
+                "quest_id": item["quest_ref"].id,
+                "plant_id": item["plant_ref"].id,
+                "type": item["quest_data"].get("type"),
+                "error": str(e)
+            })
+    return created, failures
+
+
+def commit_quests(db, items, max_workers=DEFAULT_MAX_WORKERS):
+    """Commit pending quests; returns (created_quest_ids, failures) in input order."""
+    chunks = list(_chunk(items))
+    if not chunks:
+        return [], []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        results = list(pool.map(lambda chunk: _commit_chunk(db, chunk), chunks))
+
+    created, failures = [], []
+    for chunk_created, chunk_failures in results:
+        created.extend(chunk_created)
+        failures.extend(chunk_failures)
+    return created, failures
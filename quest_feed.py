@@ -0,0 +1,163 @@
+import base64
+import json
+import os
+
+from clients import firestore
+
+# Materialized per-user quest feed.
+# UserQuestFeeds/<user_id> holds a compact summary of every quest assigned to
+# the user, keyed by quest ID, so listing a user's quests is one small
+# document read instead of a query over Quests. Entries are written with
+# merge-sets (no read needed) alongside the quest writes: when a quest is
+# generated for an adopter, accepted, or completed. Every write also prunes
+# old entries (generation included, so an adopter who never opens the app
+# doesn't accumulate quests), keeping the document well under Firestore's
+# 1 MiB and a page read bounded.
+# A feed is only trusted once it is marked complete; until then (users whose
+# quests predate the feed) the first read rebuilds it from Quests in a
+# transaction.
+
+FEEDS_COLLECTION = "UserQuestFeeds"
+FEED_FIELDS = ("type", "plant_id", "status", "reward_points", "created_at")
+# Quest fields a page may ask for with ?fields=; the ones outside the feed are read from Quests
+PROJECTABLE_FIELDS = FEED_FIELDS + ("assigned_to", "completed_by", "photo_url", "proof_submission", "verified")
+QUEST_FEED_MAX_COMPLETED = int(os.environ.get("QUEST_FEED_MAX_COMPLETED", 100))
+QUEST_FEED_MAX_PENDING = int(os.environ.get("QUEST_FEED_MAX_PENDING", 200))
+QUEST_FEED_MAX_ENTRIES = int(os.environ.get("QUEST_FEED_MAX_ENTRIES", 500))
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def feed_ref(db, user_id):
+    return db.collection(FEEDS_COLLECTION).document(user_id)
+
+
+def summary(quest_data):
+    return {field: quest_data.get(field) for field in FEED_FIELDS}
+
+
+def entry_write(db, user_id, quest_id, fields):
+    """(doc_ref, data) merge-set that adds or updates one feed entry; `fields` may be partial."""
+    return feed_ref(db, user_id), {"quests": {quest_id: fields}}
+
+
+def removal_write(db, user_id, quest_ids):
+    return feed_ref(db, user_id), {"quests": {quest_id: firestore.DELETE_FIELD for quest_id in quest_ids}}
+
+
+def _sort_key(quest_id, entry):
+    # Newest first, then by ID so the order is total
+    created_at = entry.get("created_at")
+    return (-created_at.timestamp() if created_at else 0.0, quest_id)
+
+
+def stale_entries(feed_data, incoming=None):
+    """IDs to drop from a feed once the `incoming` {quest_id: entry} are written.
+
+    The oldest completed past QUEST_FEED_MAX_COMPLETED, the oldest pending
+    past QUEST_FEED_MAX_PENDING, then the oldest past QUEST_FEED_MAX_ENTRIES.
+    Incoming entries count towards the limits but are never dropped.
+    """
+    quests = dict((feed_data or {}).get("quests") or {})
+    for quest_id, entry in (incoming or {}).items():
+        quests[quest_id] = {**quests.get(quest_id, {}), **entry}
+    ordered = sorted(quests, key=lambda quest_id: _sort_key(quest_id, quests[quest_id]))
+    stale = set()
+    for status, cap in (("completed", QUEST_FEED_MAX_COMPLETED), ("pending", QUEST_FEED_MAX_PENDING)):
+        stale.update([quest_id for quest_id in ordered if quests[quest_id].get("status") == status][cap:])
+    stale.update([quest_id for quest_id in ordered if quest_id not in stale][QUEST_FEED_MAX_ENTRIES:])
+    return sorted(stale - set(incoming or {}))
+
+
+def build_feed(transaction, db, user_id):
+    """Rebuild the user's feed from their quests; returns the feed data."""
+    ref = feed_ref(db, user_id)
+    snapshot = ref.get(transaction=transaction)
+    data = snapshot.to_dict() if snapshot.exists else None
+    if data and data.get("complete"):
+        return data
+
+    quests = {doc.id: summary(doc.to_dict())
+              for doc in transaction.get(db.collection("Quests").where("assigned_to", "==", user_id))}
+    for quest_id in stale_entries({"quests": quests}):
+        quests.pop(quest_id, None)
+    data = {"quests": quests, "complete": True}
+    transaction.set(ref, data)
+    return data
+
+
+def load_feed(db, user_id):
+    """{quest_id: entry} for the user: one document read once the feed is complete."""
+    snapshot = feed_ref(db, user_id).get()
+    data = snapshot.to_dict() if snapshot.exists else None
+    if not data or not data.get("complete"):
+        data = firestore.transactional(build_feed)(db.transaction(), db, user_id)
+    return data.get("quests") or {}
+
+
+# ========== 📄 PAGES ==========
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        score, quest_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(score), str(quest_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def parse_fields(raw):
+    """'type,status' -> ('type', 'status'); None means every feed field. Raises ValueError on unknown fields."""
+    if not raw:
+        return FEED_FIELDS
+    fields = tuple(field.strip() for field in raw.split(",") if field.strip() and field.strip() != "id")
+    unknown = [field for field in fields if field not in PROJECTABLE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (allowed: {', '.join(PROJECTABLE_FIELDS)})")
+    return fields
+
+
+def page_args(args):
+    """(after, limit, fields) from ?cursor=&limit=&fields=; raises ValueError on bad input."""
+    try:
+        limit = max(1, min(int(args["limit"]), MAX_PAGE_SIZE)) if args.get("limit") else DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    after = decode_cursor(args["cursor"]) if args.get("cursor") else None
+    return after, limit, parse_fields(args.get("fields"))
+
+
+def page(quests, status=None, after=None, limit=DEFAULT_PAGE_SIZE, fields=FEED_FIELDS):
+    """One page of {quest_id: entry}, newest first, starting after the cursor key `after`.
+
+    Returns (items, next_cursor). Items carry "id" and whichever of `fields`
+    the entries have; callers fill in fields that are not part of the feed.
+    """
+    keyed = sorted(
+        (_sort_key(quest_id, entry), quest_id, entry) for quest_id, entry in quests.items()
+        if status is None or entry.get("status") == status
+    )
+    if after is not None:
+        keyed = [item for item in keyed if item[0] > after]
+
+    selected = keyed[:limit]
+    items = [{"id": quest_id, **{field: entry[field] for field in fields if field in entry}}
+             for _, quest_id, entry in selected]
+    next_cursor = encode_cursor(list(selected[-1][0])) if len(keyed) > limit else None
+    return items, next_cursor
+
+
+def missing_fields(fields):
+    """Requested fields that are not stored in the feed and have to come from Quests."""
+    return [field for field in fields if field not in FEED_FIELDS]
+
+
+def fill_fields(items, fields, quest_docs):
+    """Copy `fields` from the quest snapshots (one per item, any order) into the page items."""
+    by_id = {doc.id: doc.to_dict() or {} for doc in quest_docs}
+    for item in items:
+        quest = by_id.get(item["id"], {})
+        item.update({field: quest[field] for field in fields if field in quest})
+    return items
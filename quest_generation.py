@@ -0,0 +1,89 @@
+from datetime import timedelta
+import pytz
+
+from clients import firestore
+from quest_batch import pending_quest, commit_quests
+import quest_schedule
+import quest_feed
+
+# Quest generation core, shared by the /generate_quests route and quest_runner.
+
+
+def build_pending_quests(db, due, now):
+    """Turn due schedule entries ({plant_id: [(entry_ref, quest_type, update_time)]}) into pending quests."""
+    plants_ref = db.collection("Plants")
+    quests_ref = db.collection("Quests")
+    users_ref = db.collection("Users")
+
+    pending = []
+    feed_writes = {}
+    plants = quest_schedule.get_plants(db, due.keys(), field_paths=["adopted_by", "last_watered"])
+
+    for plant_id, entries in due.items():
+        plant = plants.get(plant_id)
+        if plant is None:
+            # Plant was deleted; drop its schedule so it stops coming up as due
+            for entry_ref, _, _ in entries:
+                entry_ref.delete()
+            continue
+
+        adopted_by = plant.get("adopted_by")
+        last_watered = plant.get("last_watered")
+
+        for _, quest_type, read_at in entries:
+            quest_data = {
+                "assigned_to": adopted_by or "",
+                "created_at": now,
+                "plant_id": plant_id,
+                "proof_submission": {},
+                "photo_url": None,
+                "verified": False,
+                "reward_points": 50,
+                "status": "pending",
+                "type": quest_type
+            }
+
+            user_ref = None
+            if adopted_by:
+                if quest_type != "Water Plant":
+                    user_ref = users_ref.document(adopted_by)
+                elif last_watered and now - last_watered.replace(tzinfo=pytz.UTC) >= timedelta(days=1):
+                    user_ref = users_ref.document(adopted_by)
+
+            quest_ref = quests_ref.document()
+            schedule_write = quest_schedule.after_quest_created(db, plant_id, quest_type, now, read_at)
+            extra_writes = []
+            if adopted_by:
+                feed_write = quest_feed.entry_write(db, adopted_by, quest_ref.id, quest_feed.summary(quest_data))
+                feed_writes.setdefault(adopted_by, []).append(feed_write[1])
+                extra_writes.append(feed_write)
+
+            pending.append(pending_quest(
+                quest_ref, quest_data, plants_ref.document(plant_id), user_ref,
+                schedule_write=schedule_write, extra_writes=extra_writes
+            ))
+
+    prune_feeds(db, feed_writes)
+    return pending
+
+
+def prune_feeds(db, feed_writes):
+    """Add deletions for entries the adopters' feeds outgrow to their first entry write of this run."""
+    if not feed_writes:
+        return
+    feeds = {doc.id: doc.to_dict() if doc.exists else None
+             for doc in db.get_all([quest_feed.feed_ref(db, user_id) for user_id in feed_writes])}
+    for user_id, writes in feed_writes.items():
+        incoming = {quest_id: entry for data in writes for quest_id, entry in data["quests"].items()}
+        stale = quest_feed.stale_entries(feeds.get(user_id), incoming)
+        writes[0]["quests"].update({quest_id: firestore.DELETE_FIELD for quest_id in stale})
+
+
+def generate_for_due(db, due, now, max_workers):
+    """Create and commit quests for `due`; returns (created_quest_ids, failures)."""
+    pending = build_pending_quests(db, due, now)
+    return commit_quests(db, pending, max_workers=max_workers)
+
+
+def generate_all_due(db, now, max_workers):
+    return generate_for_due(db, quest_schedule.due_entries(db, now), now, max_workers)
@@ -0,0 +1,166 @@
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from datetime import datetime
+import pytz
+from google.api_core.exceptions import AlreadyExists
+from firebase_admin import credentials, initialize_app, firestore
+import firebase_admin
+from dotenv import load_dotenv
+
+import quest_generation
+import quest_schedule
+
+# Standalone, sharded and resumable quest generation.
+# The QuestSchedule bucket space is split into contiguous shards. Each shard
+# walks its buckets page by page; committing a quest advances its schedule
+# entry in the same batch, so the "due" query itself is the cursor and a
+# re-run never sees an entry twice. The schedule advance is conditional on
+# the entry being unchanged since it was read, so a second processor on the
+# same entries (a resumed shard whose predecessor is still running, or
+# POST /generate_quests alongside the runner) fails its write instead of
+# creating the quest again. Per-shard progress (next bucket and
+# counters) is checkpointed under QuestRuns/<run_id>/shards/<shard>.
+#
+#   python quest_runner.py --shards 16 --workers 4      # whole run on one machine
+#   python quest_runner.py --shards 16 --shard 3        # just shard 3 of 16
+
+load_dotenv()
+
+RUNS_COLLECTION = "QuestRuns"
+DEFAULT_SHARDS = 16
+DEFAULT_PAGE_SIZE = 200
+
+
+def get_db():
+    if not firebase_admin._apps:
+        cred = credentials.Certificate("./plantquest-8a4bd-firebase-adminsdk-fbsvc-ffc04c7186.json")
+        initialize_app(cred)
+    return firestore.client()
+
+
+def shard_buckets(shard, shards):
+    lo = shard * quest_schedule.SCHEDULE_BUCKETS // shards
+    hi = (shard + 1) * quest_schedule.SCHEDULE_BUCKETS // shards
+    return range(lo, hi)
+
+
+def start_run(db, run_id, shards):
+    """Create the run document (or join an existing one); returns the run's fixed `now`."""
+    run_ref = db.collection(RUNS_COLLECTION).document(run_id)
+    try:
+        now = datetime.now(pytz.UTC)
+        run_ref.create({"now": now, "shards": shards, "started_at": firestore.SERVER_TIMESTAMP})
+        return now
+    except AlreadyExists:
+        run = run_ref.get().to_dict()
+        if run["shards"] != shards:
+            raise ValueError(f"Run {run_id} was started with {run['shards']} shards, not {shards}")
+        return run["now"]
+
+
+def run_shard(run_id, shard, shards, now, page_size=DEFAULT_PAGE_SIZE, write_workers=4):
+    db = get_db()
+    checkpoint_ref = db.collection(RUNS_COLLECTION).document(run_id) \
+        .collection("shards").document(str(shard))
+    snapshot = checkpoint_ref.get()
+    checkpoint = snapshot.to_dict() if snapshot.exists else {}
+    if checkpoint.get("done"):
+        print(f"Shard {shard}/{shards} already done")
+        return checkpoint
+
+    buckets = shard_buckets(shard, shards)
+    bucket = checkpoint.get("next_bucket", buckets.start)
+    created = checkpoint.get("quests_created", 0)
+    failed = checkpoint.get("quests_failed", 0)
+
+    while bucket < buckets.stop:
+        # Entries that failed (or are unusable) stay due; skip them for the
+        # rest of this pass instead of fetching them again forever.
+        skip = set()
+        while True:
+            entries = [
+                entry for entry in quest_schedule.due_in_bucket(db, bucket, now, page_size + len(skip))
+                if entry.id not in skip
+            ]
+            if not entries:
+                break
+
+            due = quest_schedule.group_due(entries)
+            skip.update(
+                entry.id for entry in entries
+                if (entry.to_dict() or {}).get("type") not in quest_schedule.QUEST_TYPES
+            )
+
+            quest_ids, failures = quest_generation.generate_for_due(db, due, now, write_workers)
+            created += len(quest_ids)
+            failed += len(failures)
+            for failure in failures:
+                skip.add(quest_schedule.schedule_ref(db, failure["plant_id"], failure["type"]).id)
+                print(f"Shard {shard}: quest for {failure['plant_id']} ({failure['type']}) failed: {failure['error']}")
+
+            checkpoint_ref.set({
+                "next_bucket": bucket,
+                "quests_created": created,
+                "quests_failed": failed,
+                "updated_at": firestore.SERVER_TIMESTAMP
+            }, merge=True)
+
+        bucket += 1
+        checkpoint_ref.set({"next_bucket": bucket, "quests_created": created, "quests_failed": failed}, merge=True)
+
+    result = {"done": True, "next_bucket": bucket, "quests_created": created, "quests_failed": failed}
+    checkpoint_ref.set({**result, "updated_at": firestore.SERVER_TIMESTAMP}, merge=True)
+    print(f"Shard {shard}/{shards}: {created} quests created, {failed} failed")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded, resumable quest generation")
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS)
+    parser.add_argument("--shard", type=int, help="Only run this shard (0-based)")
+    parser.add_argument("--workers", type=int, default=4, help="Shards processed in parallel")
+    parser.add_argument("--processes", action="store_true", help="Use a process pool instead of threads")
+    parser.add_argument("--run-id", help="Resume or join this run (default: today's UTC date and shard count)")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--write-workers", type=int, default=int(os.environ.get("QUEST_WRITE_WORKERS", 4)))
+    args = parser.parse_args()
+
+    if not 0 < args.shards <= quest_schedule.SCHEDULE_BUCKETS:
+        parser.error(f"--shards must be between 1 and {quest_schedule.SCHEDULE_BUCKETS}")
+    if args.shard is not None and not 0 <= args.shard < args.shards:
+        parser.error("--shard must be in [0, --shards)")
+
+    run_id = args.run_id or f"{datetime.now(pytz.UTC).date().isoformat()}-{args.shards}"
+    now = start_run(get_db(), run_id, args.shards)
+    shards = [args.shard] if args.shard is not None else list(range(args.shards))
+    print(f"Run {run_id}: shards {shards} (due as of {now})")
+
+    workers = max(1, min(args.workers, len(shards)))
+    if args.processes:
+        # Spawned workers build their own gRPC channels instead of inheriting ours
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+
+    totals = {"quests_created": 0, "quests_failed": 0}
+    with pool:
+        futures = {
+            pool.submit(run_shard, run_id, shard, args.shards, now, args.page_size, args.write_workers): shard
+            for shard in shards
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Shard {futures[future]} crashed: {e} (re-run with --run-id {run_id} to resume)")
+                continue
+            totals["quests_created"] += result.get("quests_created", 0)
+            totals["quests_failed"] += result.get("quests_failed", 0)
+
+    print(f"Run {run_id}: {totals['quests_created']} quests created, {totals['quests_failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+from datetime import timedelta
+import zlib
+from clients import firestore
+import pytz
+
+# Per-plant, per-type quest schedule.
+# One QuestSchedule document per (plant, quest type) holds `next_due_at`, so
+# quest generation only has to read the entries that are actually due.
+# Entries also carry a stable `bucket` (hash of the plant ID) so a run can be
+# split into shards of contiguous buckets.
+
+SCHEDULE_COLLECTION = "QuestSchedule"
+SCHEDULE_BUCKETS = 256
+GET_ALL_CHUNK = 100
+
+QUEST_TYPES = {
+    "Water Plant": {"frequency_days": 1},
+    "Health Assessment": {"frequency_days": 3},
+    "Growth Report": {"frequency_days": 3},
+    "Photo Submission": {"frequency_days": 7}
+}
+
+
+def frequency(quest_type):
+    return timedelta(days=QUEST_TYPES[quest_type]["frequency_days"])
+
+
+def schedule_ref(db, plant_id, quest_type):
+    slug = quest_type.lower().replace(" ", "_")
+    return db.collection(SCHEDULE_COLLECTION).document(f"{plant_id}__{slug}")
+
+
+def bucket_for(plant_id):
+    return zlib.crc32(plant_id.encode("utf-8")) % SCHEDULE_BUCKETS
+
+
+def schedule_entry(plant_id, quest_type, next_due_at, last_created_at=None):
+    return {
+        "plant_id": plant_id,
+        "bucket": bucket_for(plant_id),
+        "type": quest_type,
+        "next_due_at": next_due_at,
+        "last_created_at": last_created_at
+    }
+
+
+def new_plant_schedule(db, plant_id):
+    """(doc_ref, data) pairs making every quest type due immediately for a new plant."""
+    return [
+        (schedule_ref(db, plant_id, quest_type),
+         schedule_entry(plant_id, quest_type, firestore.SERVER_TIMESTAMP))
+        for quest_type in QUEST_TYPES
+    ]
+
+
+def after_quest_created(db, plant_id, quest_type, created_at, read_at=None):
+    """(doc_ref, data, option) advancing the schedule once a quest has been created.
+
+    With `read_at` (the entry's update_time when it was found due) the write
+    is an update that fails if anything changed the entry since, so two
+    processors that picked up the same due entry can't both create its quest.
+    """
+    option = db.write_option(last_update_time=read_at) if read_at is not None else None
+    return (schedule_ref(db, plant_id, quest_type),
+            schedule_entry(plant_id, quest_type, created_at + frequency(quest_type), created_at),
+            option)
+
+
+def due_entries(db, now):
+    """Schedule entries with next_due_at <= now, grouped by group_due()."""
+    return group_due(db.collection(SCHEDULE_COLLECTION).where("next_due_at", "<=", now).stream())
+
+
+def due_in_bucket(db, bucket, now, limit):
+    return db.collection(SCHEDULE_COLLECTION) \
+        .where("bucket", "==", bucket) \
+        .where("next_due_at", "<=", now) \
+        .limit(limit) \
+        .stream()
+
+
+def group_due(entries):
+    """{plant_id: [(entry_ref, quest_type, update_time)]}; update_time guards the schedule advance."""
+    due = {}
+    for entry in entries:
+        data = entry.to_dict()
+        if data.get("type") not in QUEST_TYPES:
+            continue
+        due.setdefault(data["plant_id"], []).append((entry.reference, data["type"], entry.update_time))
+    return due
+
+
+def get_plants(db, plant_ids, field_paths=None):
+    """Fetch plants by ID in get_all chunks; missing plants are left out."""
+    plants = {}
+    plants_ref = db.collection("Plants")
+    plant_ids = list(plant_ids)
+    for i in range(0, len(plant_ids), GET_ALL_CHUNK):
+        refs = [plants_ref.document(plant_id) for plant_id in plant_ids[i:i + GET_ALL_CHUNK]]
+        for snapshot in db.get_all(refs, field_paths=field_paths):
+            if snapshot.exists:
+                plants[snapshot.id] = snapshot.to_dict()
+    return plants
+
+
+def derive_schedule(quests, plant_ids, now):
+    """Rebuild schedule entries from existing quests: {(plant_id, type): entry}."""
+    latest = {}
+    for quest in quests:
+        key = (quest.get("plant_id"), quest.get("type"))
+        created_at = quest.get("created_at")
+        if key[1] not in QUEST_TYPES or not created_at:
+            continue
+        created_at = created_at.replace(tzinfo=pytz.UTC)
+        if key not in latest or created_at > latest[key]:
+            latest[key] = created_at
+
+    schedule = {}
+    for plant_id in plant_ids:
+        for quest_type in QUEST_TYPES:
+            last_created = latest.get((plant_id, quest_type))
+            next_due = last_created + frequency(quest_type) if last_created else now
+            schedule[(plant_id, quest_type)] = schedule_entry(plant_id, quest_type, next_due, last_created)
+    return schedule
@@ -0,0 +1,46 @@
+import argparse
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import eco_points
+
+# Standalone eco-points roll-up, for servers that don't call
+# app.start_services() (gunicorn, `flask run`). Run one next to the web
+# processes, which can then set ECO_POINTS_ROLLUP_SECONDS=0. Several runners
+# are safe: each chunk of users is folded in its own transaction.
+#
+#   python rollup_runner.py                 # every ECO_POINTS_ROLLUP_SECONDS
+#   python rollup_runner.py --once          # drain the backlog and exit (cron)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold eco-point shards into Users and the leaderboards")
+    parser.add_argument("--once", action="store_true", help="Drain the backlog once and exit")
+    parser.add_argument("--interval", type=float, default=eco_points.ECO_POINTS_ROLLUP_SECONDS or 10,
+                        help="Seconds between roll-ups")
+    parser.add_argument("--batch-size", type=int, default=200, help="Dirty shards per roll-up")
+    args = parser.parse_args()
+    if args.interval <= 0:
+        parser.error("--interval must be positive")
+
+    rollup = eco_points.EcoPointsRollup(interval=args.interval, batch_size=args.batch_size)
+    if args.once:
+        started = time.perf_counter()
+        shards = rollup.drain()
+        stats = rollup.stats()
+        print(f"Rolled up {shards} shards for {stats['users']} users, "
+              f"{stats['boards_written']} boards written in {time.perf_counter() - started:.1f}s")
+        return
+
+    print(f"Rolling up eco points every {args.interval:g}s")
+    try:
+        rollup.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
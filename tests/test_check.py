@@ -0,0 +1,79 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import check
+
+
+def plant_frame(shift):
+    # Green textured frame (sharp, lots of green); shift adds motion
+    frame = np.zeros((48, 64, 3), np.uint8)
+    frame[:, :] = (40, 160, 40)
+    frame[::4, :] = (10, 60, 10)
+    return np.roll(frame, shift, axis=1)
+
+
+def blank_frame(shift):
+    frame = np.full((48, 64, 3), 128, np.uint8)
+    frame[::4, :] = 0
+    return np.roll(frame, shift, axis=1)
+
+
+def fake_sampler(monkeypatch, frames, expected, trusted):
+    monkeypatch.setattr(check, "sample_count", lambda path, interval=30: (expected, (64, 48), trusted))
+    monkeypatch.setattr(check, "iter_frames", lambda path, interval=30: iter(frames))
+
+
+def test_early_decision():
+    assert check.early_decision(0, 0.0, 4, None) is None
+    assert check.early_decision(0, 0.0, 10, 10) is None
+    # No plant frame yet and 5 remaining can never reach 0.3 * 20
+    assert check.early_decision(0, 0.0, 15, 20) is False
+    assert check.early_decision(6, 57.0, 8, 20, diff_threshold=3) is True
+    # Confidence reached but motion could still fall below the bar
+    assert check.early_decision(6, 56.0, 8, 20, diff_threshold=3) is None
+
+
+def test_untrusted_count_scans_whole_video(monkeypatch):
+    # The container claims 4 samples but the stream has 14; the first 4
+    # would look like a confident plant video
+    frames = [plant_frame(i * 3) for i in range(4)] + [blank_frame(i * 3) for i in range(10)]
+    fake_sampler(monkeypatch, frames, expected=4, trusted=False)
+    result = check.verify_video("fake.mp4")
+    assert result["samples"] == 14
+    assert not result["stopped_early"]
+    assert result["contains_plant"] is False
+
+    fake_sampler(monkeypatch, frames, expected=None, trusted=False)
+    assert check.verify_video("fake.mp4")["contains_plant"] is False
+
+
+def test_trusted_count_stops_with_full_scan_verdict(monkeypatch):
+    frames = [blank_frame(i * 3) for i in range(16)] + [plant_frame(i * 3) for i in range(4)]
+    fake_sampler(monkeypatch, frames, expected=20, trusted=True)
+    early = check.verify_video("fake.mp4")
+    fake_sampler(monkeypatch, frames, expected=None, trusted=False)
+    full = check.verify_video("fake.mp4")
+    assert early["stopped_early"] and early["samples"] < 20
+    assert early["contains_plant"] == full["contains_plant"] is False
+
+
+def test_count_is_exact(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(25):
+        writer.write(plant_frame(i))
+    writer.release()
+
+    cap = cv2.VideoCapture(path)
+    assert check.count_is_exact(cap, 25)
+    cap.release()
+    for wrong in (20, 30):
+        cap = cv2.VideoCapture(path)
+        assert not check.count_is_exact(cap, wrong)
+        cap.release()
+    assert check.sample_count(path, interval=10) == (3, (64, 48), True)
@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import eco_points
+
+
+def total(user_id, points, area=None, previous_area=None):
+    return {"user_id": user_id, "name": user_id, "points": points, "area": area, "previous_area": previous_area}
+
+
+def entry(user_id, points):
+    return {"user_id": user_id, "name": user_id, "points": points}
+
+
+def test_board_changes_global_and_area():
+    boards = eco_points.board_changes([total("a", 10, "u33d"), total("b", 5)])
+    assert set(boards) == {"global", "area_u33d"}
+    assert [e["user_id"] for e in boards["global"][0]] == ["a", "b"]
+    assert boards["area_u33d"] == ([entry("a", 10)], set())
+
+
+def test_board_changes_move_removes_from_previous_area():
+    boards = eco_points.board_changes([total("a", 10, "u09t", previous_area="u33d")])
+    assert boards["area_u33d"] == ([], {"a"})
+    assert boards["area_u09t"] == ([entry("a", 10)], set())
+    # Staying in the same area removes nothing
+    boards = eco_points.board_changes([total("a", 10, "u33d", previous_area="u33d")])
+    assert boards["area_u33d"][1] == set()
+
+
+def test_merged_board_updates_and_ranks(monkeypatch):
+    monkeypatch.setattr(eco_points, "LEADERBOARD_SIZE", 3)
+    current = [entry("a", 30), entry("b", 20), entry("c", 10)]
+    ranked = eco_points.merged_board(current, [entry("c", 40), entry("d", 15)], set())
+    assert [(e["user_id"], e["points"]) for e in ranked] == [("c", 40), ("a", 30), ("b", 20)]
+
+
+def test_merged_board_keeps_higher_total_and_breaks_ties_by_id(monkeypatch):
+    monkeypatch.setattr(eco_points, "LEADERBOARD_SIZE", 3)
+    # A stale (lower) total never replaces a newer one
+    ranked = eco_points.merged_board([entry("b", 20)], [entry("b", 15), entry("a", 20)], set())
+    assert ranked == [entry("a", 20), entry("b", 20)]
+
+
+def test_merged_board_drops_removed(monkeypatch):
+    monkeypatch.setattr(eco_points, "LEADERBOARD_SIZE", 3)
+    current = [entry("a", 30), entry("b", 20), entry("c", 10)]
+    ranked = eco_points.merged_board(current, [], {"a"})
+    assert [e["user_id"] for e in ranked] == ["b", "c"]
+    # A rebuilt board passed as `current` fills the gap
+    rebuilt = current + [entry("d", 5)]
+    ranked = eco_points.merged_board(rebuilt, [], {"a"})
+    assert [e["user_id"] for e in ranked] == ["b", "c", "d"]
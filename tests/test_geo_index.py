@@ -0,0 +1,56 @@
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geo_index
+
+
+def circle_points(lat, lng, radius_m, steps=36):
+    # Points just inside the circle, on a local flat-earth approximation
+    for i in range(steps):
+        angle = 2 * math.pi * i / steps
+        d_lat = 0.99 * radius_m * math.cos(angle) / geo_index.METERS_PER_DEG_LAT
+        d_lng = 0.99 * radius_m * math.sin(angle) / (geo_index.METERS_PER_DEG_LAT * math.cos(math.radians(lat)))
+        yield max(-90.0, min(90.0, lat + d_lat)), (lng + d_lng + 180) % 360 - 180
+
+
+@pytest.mark.parametrize("lat,lng,radius_m", [
+    (12.9716, 77.5946, 50),
+    (12.9716, 77.5946, 5000),
+    (52.52, 13.405, 1200),
+    (-33.8688, 151.2093, 300),
+    # Cell edges: the equator / prime meridian and the antimeridian
+    (0.0, 0.0, 1000),
+    (10.0, 179.999, 2000),
+])
+def test_covering_cells_cover_the_circle(lat, lng, radius_m):
+    cells = geo_index.covering_cells(lat, lng, radius_m)
+    precision = geo_index.precision_for_radius(lat, radius_m)
+    assert len(cells) <= 9 and len({len(cell) for cell in cells}) == 1
+    assert geo_index.encode(lat, lng, precision) in cells
+    for p_lat, p_lng in circle_points(lat, lng, radius_m):
+        assert geo_index.encode(p_lat, p_lng).startswith(tuple(cells)), (p_lat, p_lng)
+
+
+def test_covering_cells_near_pole_skip_rows_past_it():
+    cells = geo_index.covering_cells(89.99, 0.0, 500)
+    assert 0 < len(cells) < 9
+
+
+def test_cells_are_at_least_the_radius():
+    for radius_m in (10, 100, 1000, 10000):
+        precision = geo_index.precision_for_radius(45.0, radius_m)
+        lat_h, lng_w = geo_index.cell_size_deg(precision)
+        assert lat_h * geo_index.METERS_PER_DEG_LAT >= radius_m
+        assert lng_w * geo_index.METERS_PER_DEG_LAT * math.cos(math.radians(45.0)) >= radius_m
+
+
+def test_encode_decode_bbox():
+    geohash = geo_index.encode(12.9716, 77.5946, 7)
+    lat_lo, lat_hi, lng_lo, lng_hi = geo_index.decode_bbox(geohash)
+    assert lat_lo <= 12.9716 < lat_hi and lng_lo <= 77.5946 < lng_hi
+    assert geo_index.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
@@ -0,0 +1,51 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_hashes import BKTree, hamming
+
+
+def brute_force(items, value, max_distance):
+    found = {}
+    for item_value, key in items:
+        distance = bin(item_value ^ value).count("1")
+        if distance <= max_distance:
+            found[key] = distance
+    return found
+
+
+def test_search_matches_brute_force():
+    rng = random.Random(7)
+    tree = BKTree()
+    items = []
+    base = rng.getrandbits(64)
+    for i in range(300):
+        # Clusters of near-duplicates around a few hashes, plus noise
+        value = base ^ (1 << rng.randrange(64)) if i % 3 else rng.getrandbits(64)
+        items.append((value, f"p{i}"))
+        tree.add(value, f"p{i}")
+    for _ in range(20):
+        query = base ^ rng.getrandbits(64) if rng.random() < 0.5 else base ^ (1 << rng.randrange(64))
+        for max_distance in (0, 2, 5, 12):
+            assert tree.search(query, max_distance) == brute_force(items, query, max_distance)
+
+
+def test_same_hash_holds_several_keys_and_remove():
+    tree = BKTree()
+    assert tree.search(0, 64) == {}
+    tree.add(0b1010, "a")
+    tree.add(0b1010, "b")
+    tree.add(0b1011, "c")
+    assert tree.search(0b1010, 0) == {"a": 0, "b": 0}
+    tree.remove(0b1010, "a")
+    # The node still routes searches to its children
+    assert tree.search(0b1010, 1) == {"b": 0, "c": 1}
+    tree.remove(0b1111, "c")
+    assert tree.search(0b1011, 0) == {"c": 0}
+
+
+def test_hamming_on_hex():
+    assert hamming("ff00", "ff00") == 0
+    assert hamming("ff00", "0f01") == 5
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import JobQueue, QUEUED, RUNNING, FAILED, SUCCEEDED
+
+
+def make_queue(tmp_path, **kwargs):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=0, **kwargs)
+    queue.register("k", lambda payload, progress: ({}, 200))
+    return queue
+
+
+def set_job(queue, job_id, **fields):
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    with queue._lock:
+        queue._db().execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+
+def test_expired_lease_requeues_until_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    retried = queue.submit("k", {"n": 1})
+    exhausted = queue.submit("k", {"n": 2})
+    expired = time.time() - 1
+    set_job(queue, retried, status=RUNNING, owner="gone", lease_until=expired, attempts=1)
+    set_job(queue, exhausted, status=RUNNING, owner="gone", lease_until=expired, attempts=2)
+
+    job_id, _, payload = queue._claim()
+    assert (job_id, payload) == (retried, {"n": 1})
+    assert queue.get(retried)["attempts"] == 2
+    job = queue.get(exhausted)
+    assert job["status"] == FAILED and job["http_status"] == 500 and "giving up" in job["error"]
+
+
+def test_live_lease_is_left_alone(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=1)
+    job_id = queue.submit("k", {})
+    set_job(queue, job_id, status=RUNNING, owner="other", lease_until=time.time() + 60, attempts=1)
+    assert queue._claim() is None
+    assert queue.get(job_id)["status"] == RUNNING
+
+
+def test_prune_deletes_only_old_finished_jobs(tmp_path):
+    queue = make_queue(tmp_path, retention_seconds=60)
+    old_done, new_done, old_queued = (queue.submit("k", {}) for _ in range(3))
+    long_ago = time.time() - 120
+    set_job(queue, old_done, status=SUCCEEDED, updated_at=long_ago)
+    set_job(queue, new_done, status=FAILED)
+    set_job(queue, old_queued, status=QUEUED, updated_at=long_ago)
+
+    assert queue.prune() == 1
+    assert queue.get(old_done) is None
+    assert queue.get(new_done) is not None and queue.get(old_queued) is not None
+    assert make_queue(tmp_path, retention_seconds=0).prune() == 0
@@ -0,0 +1,50 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plant_coords_cache import PlantCoordsCache
+
+
+def change(kind, plant_id, lat=None, lng=None):
+    data = {"location": {"lat": lat, "lng": lng}} if lat is not None else {"name": plant_id}
+    document = SimpleNamespace(id=plant_id, to_dict=lambda: data)
+    return SimpleNamespace(type=SimpleNamespace(name=kind), document=document)
+
+
+def ids(cache):
+    return sorted(cache._snapshot[0])
+
+
+def test_added_modified_removed():
+    cache = PlantCoordsCache(collection=None)
+    cache._apply_changes([change("ADDED", "a", 12.97, 77.59), change("ADDED", "b", 12.98, 77.60),
+                          change("ADDED", "c", 13.50, 78.00)])
+    assert ids(cache) == ["a", "b", "c"] and len(cache) == 3
+
+    cache._apply_changes([change("REMOVED", "b"), change("MODIFIED", "c", 12.971, 77.591)])
+    assert ids(cache) == ["a", "c"]
+    assert cache._index == {plant_id: i for i, plant_id in enumerate(cache._snapshot[0])}
+    assert [plant_id for plant_id, _ in cache.query_radius(12.97, 77.59, 500)] == ["a", "c"]
+
+
+def test_losing_location_drops_the_plant():
+    cache = PlantCoordsCache(collection=None)
+    cache._apply_changes([change("ADDED", "a", 1.0, 1.0), change("ADDED", "no-location")])
+    assert ids(cache) == ["a"]
+    cache._apply_changes([change("MODIFIED", "a")])
+    assert len(cache) == 0 and cache.query_radius(1.0, 1.0, 1000) == []
+
+
+def test_snapshot_is_replaced_not_mutated():
+    cache = PlantCoordsCache(collection=None)
+    cache._apply_changes([change("ADDED", "a", 1.0, 1.0)])
+    before = cache._snapshot
+    cache._apply_changes([change("MODIFIED", "a", 2.0, 2.0)])
+    assert cache._snapshot is not before
+    assert before[1][0] != cache._snapshot[1][0]
+    # No-op changes keep the same snapshot
+    same = cache._snapshot
+    cache._apply_changes([change("MODIFIED", "a", 2.0, 2.0), change("REMOVED", "unknown")])
+    assert cache._snapshot is same
@@ -0,0 +1,77 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quest_feed
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def entry(day, status="pending", **fields):
+    return {"type": "watering", "plant_id": "p", "status": status, "reward_points": 50,
+            "created_at": START + timedelta(days=day), **fields}
+
+
+def test_page_newest_first_with_cursor():
+    quests = {f"q{day}": entry(day) for day in range(5)}
+    items, cursor = quest_feed.page(quests, limit=2)
+    assert [item["id"] for item in items] == ["q4", "q3"]
+    items, cursor = quest_feed.page(quests, after=quest_feed.decode_cursor(cursor), limit=2)
+    assert [item["id"] for item in items] == ["q2", "q1"]
+    items, cursor = quest_feed.page(quests, after=quest_feed.decode_cursor(cursor), limit=2)
+    assert [item["id"] for item in items] == ["q0"] and cursor is None
+
+
+def test_page_filters_status_and_projects_fields():
+    quests = {"a": entry(1), "b": entry(2, "completed"), "c": {"status": "pending"}}
+    items, cursor = quest_feed.page(quests, status="pending", fields=("status", "reward_points"))
+    # Entries without created_at sort last; missing fields are left out
+    assert items == [{"id": "a", "status": "pending", "reward_points": 50}, {"id": "c", "status": "pending"}]
+    assert cursor is None
+
+
+def test_page_ties_are_ordered_by_id():
+    quests = {quest_id: entry(0) for quest_id in ("b", "a", "c")}
+    first, cursor = quest_feed.page(quests, limit=1)
+    rest, _ = quest_feed.page(quests, after=quest_feed.decode_cursor(cursor))
+    assert [item["id"] for item in first + rest] == ["a", "b", "c"]
+
+
+def test_decode_cursor_round_trip_and_garbage():
+    key = (-1767225600.0, "q1")
+    assert quest_feed.decode_cursor(quest_feed.encode_cursor(list(key))) == key
+    for bad in ("not-base64!", quest_feed.encode_cursor([1, 2, 3]), quest_feed.encode_cursor("x")):
+        with pytest.raises(ValueError):
+            quest_feed.decode_cursor(bad)
+
+
+def test_stale_entries_caps(monkeypatch):
+    monkeypatch.setattr(quest_feed, "QUEST_FEED_MAX_PENDING", 2)
+    monkeypatch.setattr(quest_feed, "QUEST_FEED_MAX_COMPLETED", 1)
+    monkeypatch.setattr(quest_feed, "QUEST_FEED_MAX_ENTRIES", 10)
+    feed = {"quests": {"p1": entry(1), "p2": entry(2), "p3": entry(3),
+                       "c1": entry(1, "completed"), "c2": entry(2, "completed")}}
+    assert quest_feed.stale_entries(feed) == ["c1", "p1"]
+    # Incoming entries count towards the caps but are never dropped
+    assert quest_feed.stale_entries(feed, {"p4": entry(4)}) == ["c1", "p1", "p2"]
+    assert quest_feed.stale_entries(None) == []
+
+
+def test_stale_entries_total_cap(monkeypatch):
+    monkeypatch.setattr(quest_feed, "QUEST_FEED_MAX_ENTRIES", 2)
+    feed = {"quests": {"a": entry(1, "assigned"), "b": entry(2, "assigned"), "c": entry(3, "pending")}}
+    assert quest_feed.stale_entries(feed) == ["a"]
+
+
+def test_parse_fields_whitelist():
+    assert quest_feed.parse_fields(None) == quest_feed.FEED_FIELDS
+    assert quest_feed.parse_fields("id, type,proof_submission") == ("type", "proof_submission")
+    for bad in ("type,secret", "proof_submission.verified", "`x`"):
+        with pytest.raises(ValueError):
+            quest_feed.parse_fields(bad)
+    with pytest.raises(ValueError):
+        quest_feed.page_args({"fields": "nope"})
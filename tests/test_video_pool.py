@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry script that imports the app the way `python app.py` does and starts
+# video worker processes. Workers re-import the entry script (and so the app)
+# as __mp_main__, which must not start job workers, the roll-up or a warm-up.
+ENTRY = textwrap.dedent("""
+    import json
+    import threading
+
+    import app
+    from plant_routes import video_verifier
+
+
+    def report(conn):
+        conn.send(sorted(thread.name for thread in threading.enumerate()))
+        conn.close()
+
+
+    if __name__ == "__main__":
+        reports = []
+        for _ in range(2):
+            parent_conn, child_conn = video_verifier._ctx.Pipe(duplex=False)
+            process = video_verifier._ctx.Process(target=report, args=(child_conn,), daemon=True)
+            process.start()
+            child_conn.close()
+            reports.append(parent_conn.recv())
+            process.join()
+        print(json.dumps(reports))
+""")
+
+
+def test_worker_process_starts_no_threads(tmp_path):
+    entry = tmp_path / "entry.py"
+    entry.write_text(ENTRY)
+    env = {**os.environ, "PYTHONPATH": ROOT, "JOB_DB_PATH": str(tmp_path / "jobs.sqlite3")}
+    result = subprocess.run([sys.executable, str(entry)], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+
+    for threads in json.loads(result.stdout.strip().splitlines()[-1]):
+        assert threads == ["MainThread"]
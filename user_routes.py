@@ -1,14 +1,55 @@
 
 
 from flask import Blueprint, request, jsonify
-from firebase_admin import firestore
-from geopy.distance import geodesic
+import os
+import geo_index
+import eco_points
+import quest_feed
+from plant_coords_cache import PlantCoordsCache
 from datetime import datetime, timedelta
 import pytz
+import clients
+from clients import db, firestore
 
 user_bp = Blueprint("user", __name__)
-db = firestore.client()
 timezone = pytz.timezone("Asia/Kolkata")
+NEARBY_QUEST_RADIUS_M = 500
+NEARBY_QUEST_MAX_LIMIT = int(os.environ.get("NEARBY_QUEST_MAX_LIMIT", 200))
+USE_COORDS_CACHE = os.environ.get("PLANT_COORDS_CACHE", "1") != "0"
+plant_coords = clients.lazy("plant_coords", lambda: PlantCoordsCache(db.collection("Plants")))
+
+
+def nearby_plant_ids(lat, lng, radius_m, limit=None):
+    # Served from the in-memory coordinate cache once its listener has synced;
+    # until then (or if disabled) fall back to the geohash range queries.
+    if USE_COORDS_CACHE:
+        plant_coords.start()
+        if plant_coords.is_ready():
+            return [plant_id for plant_id, _ in plant_coords.query_radius(lat, lng, radius_m, k=limit)]
+
+    plants = geo_index.query_within(db.collection("Plants"), lat, lng, radius_m)
+    nearest = sorted((dist, plant_doc.id) for plant_doc, _, dist in plants)
+    if limit is not None:
+        nearest = nearest[:limit]
+    return [plant_id for _, plant_id in nearest]
+
+
+def parse_nearby_limit(raw):
+    """Plant limit for a nearby-quests request, clamped to NEARBY_QUEST_MAX_LIMIT; raises ValueError on bad input.
+
+    No limit (None) means every plant in range.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, bool):
+        raise ValueError("limit must be a positive integer")
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be a positive integer")
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, NEARBY_QUEST_MAX_LIMIT)
 
 
 @user_bp.route("/user/location", methods=["POST"])
@@ -36,27 +77,26 @@ def get_nearby_quests():
     lat = data.get("lat")
     lng = data.get("lng")
 
+    try:
+        limit = parse_nearby_limit(data.get("limit"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     if lat is None or lng is None:
         return jsonify({"error": "Missing coordinates"}), 400
 
-    user_coords = (lat, lng)
     quests = []
 
-    for plant_doc in db.collection("Plants").stream():
-        plant = plant_doc.to_dict()
-        plant_coords = (plant["location"]["lat"], plant["location"]["lng"])
-        print(plant_coords)
-        distance_m = geodesic(user_coords, plant_coords).meters
-        if distance_m <= 500:
-            nearby_quests = db.collection("Quests") \
-                .where("plant_id", "==", plant_doc.id) \
-                .where("status", "==", "pending") \
-                .stream()
-
-            for q in nearby_quests:
-                quest = q.to_dict()
-                quest["id"] = q.id
-                quests.append(quest)
+    for plant_id in nearby_plant_ids(lat, lng, NEARBY_QUEST_RADIUS_M, limit=limit):
+        nearby_quests = db.collection("Quests") \
+            .where("plant_id", "==", plant_id) \
+            .where("status", "==", "pending") \
+            .stream()
+
+        for q in nearby_quests:
+            quest = q.to_dict()
+            quest["id"] = q.id
+            quests.append(quest)
 
     return jsonify({"nearby_quests": quests})
 
@@ -91,17 +131,23 @@ def view_user_quests():
     user_id = request.args.get("user_id")
     status = request.args.get("status", "pending")
 
-    quests = db.collection("Quests") \
-        .where("assigned_to", "==", user_id) \
-        .where("status", "==", status) \
-        .stream()
+    if not user_id:
+        return jsonify({"error": "Missing user_id"}), 400
+    try:
+        after, limit, fields = quest_feed.page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify({
-        "quests": [
-            {**q.to_dict(), "id": q.id}
-            for q in quests
-        ]
-    })
+    # One read of the user's quest feed, then paged in memory
+    quests, next_cursor = quest_feed.page(quest_feed.load_feed(db, user_id), status, after, limit, fields)
+
+    # Fields the feed does not carry come from the quests on this page only
+    extra = quest_feed.missing_fields(fields)
+    if extra and quests:
+        refs = [db.collection("Quests").document(q["id"]) for q in quests]
+        quest_feed.fill_fields(quests, extra, db.get_all(refs, field_paths=extra))
+
+    return jsonify({"quests": quests, "next_cursor": next_cursor})
 
 @user_bp.route("/user/accept", methods=["POST"])
 def accept_quest():
@@ -113,18 +159,117 @@ def accept_quest():
         return jsonify({"error": "Missing user_id or quest_id"}), 400
 
     quest_ref = db.collection("Quests").document(quest_id)
-    quest = quest_ref.get()
+    outcome = firestore.transactional(accept_quest_in)(db.transaction(), quest_ref, user_id)
 
-    if not quest.exists:
+    if outcome == "quest_not_found":
         return jsonify({"error": "Quest not found"}), 404
+    if outcome == "completed":
+        return jsonify({"error": "Quest already completed"}), 409
+    if outcome == "assigned_to_other":
+        return jsonify({"error": "Quest already assigned to another user"}), 409
+
+    return jsonify({"message": "Quest accepted successfully"}), 200
+
+
+def assigned_to_other(quest_data, user_id):
+    """Whether another user has accepted the quest; pending quests (even ones generated for an adopter) are open."""
+    return quest_data.get("status") == "assigned" and quest_data.get("assigned_to") not in (None, "", user_id)
+
 
-    # Update the quest document
-    quest_ref.update({
+def accept_quest_in(transaction, quest_ref, user_id):
+    """Assign the quest to the user inside `transaction`; returns the outcome.
+
+    Reading the quest in the transaction means a completion or another
+    user's accept that commits first is seen here, so a completed quest can
+    never go back to "assigned" (and pay out again).
+    """
+    feed_ref = quest_feed.feed_ref(db, user_id)
+    docs = {doc.reference.path: doc for doc in transaction.get_all([quest_ref, feed_ref])}
+    quest_doc = docs[quest_ref.path]
+    if not quest_doc.exists:
+        return "quest_not_found"
+    quest_data = quest_doc.to_dict()
+    if quest_data.get("status") == "completed":
+        return "completed"
+    if assigned_to_other(quest_data, user_id):
+        return "assigned_to_other"
+    if quest_data.get("status") == "assigned":
+        return "accepted"
+
+    # The quest and both users' feeds in one commit
+    transaction.update(quest_ref, {
         "assigned_to": user_id,
         "status": "assigned"
     })
+    write_feed_entry(transaction, docs[feed_ref.path], user_id, quest_ref.id,
+                     {**quest_data, "assigned_to": user_id, "status": "assigned"})
+    previous = quest_data.get("assigned_to")
+    if previous and previous != user_id:
+        transaction.set(*quest_feed.removal_write(db, previous, [quest_ref.id]), merge=True)
+    return "accepted"
+
+
+def write_feed_entry(writer, feed_doc, user_id, quest_id, quest_data):
+    """Upsert the quest in the user's feed, dropping entries the feed has outgrown."""
+    feed_ref, data = quest_feed.entry_write(db, user_id, quest_id, quest_feed.summary(quest_data))
+    stale = quest_feed.stale_entries(feed_doc.to_dict() if feed_doc.exists else None, {quest_id: data["quests"][quest_id]})
+    data["quests"].update({stale_id: firestore.DELETE_FIELD for stale_id in stale})
+    writer.set(feed_ref, data, merge=True)
+
+
+# Plant field stamped when a quest of this type is completed
+QUEST_TIMESTAMP_FIELDS = {
+    "Water Plant": "last_watered",
+    "Health Assessment": "last_health_assessment",
+}
+
+
+def complete_quest_in(transaction, quest_ref, user_ref):
+    """Complete the quest and award its points inside `transaction`.
+
+    The quest document is the idempotency key: once its status is
+    "completed" nothing is written again, so client retries (and Firestore
+    re-running the transaction on contention) cannot award points twice.
+    Returns (outcome, quest_data).
+    """
+    feed_ref = quest_feed.feed_ref(db, user_ref.id)
+    docs = {doc.reference.path: doc for doc in transaction.get_all([quest_ref, user_ref, feed_ref])}
+    quest_doc = docs[quest_ref.path]
+    if not quest_doc.exists:
+        return "quest_not_found", None
+    quest_data = quest_doc.to_dict()
+    if quest_data.get("status") == "completed":
+        return "already_completed", quest_data
+    if not docs[user_ref.path].exists:
+        return "user_not_found", quest_data
+    if assigned_to_other(quest_data, user_ref.id):
+        return "assigned_to_other", quest_data
+
+    quest_id = quest_ref.id
+    plant_id = quest_data.get("plant_id")
+
+    transaction.update(quest_ref, {
+        "status": "completed",
+        "completed_by": user_ref.id,
+        "proof_submission.timestamp": firestore.SERVER_TIMESTAMP,
+        "proof_submission.verified": True
+    })
+    # The user document is only read: the points and quests_completed go
+    # through a shard, so completions never contend on it
+    eco_points.award(transaction, user_ref.id, quest_data.get("reward_points", 0), quests_completed=[quest_id])
+    write_feed_entry(transaction, docs[feed_ref.path], user_ref.id, quest_id, {**quest_data, "status": "completed"})
+    previous = quest_data.get("assigned_to")
+    if previous and previous != user_ref.id:
+        transaction.set(*quest_feed.removal_write(db, previous, [quest_id]), merge=True)
+    if plant_id:
+        plant_update = {"quests": firestore.ArrayRemove([quest_id])}
+        timestamp_field = QUEST_TIMESTAMP_FIELDS.get(quest_data.get("type"))
+        if timestamp_field:
+            plant_update[timestamp_field] = firestore.SERVER_TIMESTAMP
+        transaction.update(db.collection("Plants").document(plant_id), plant_update)
+
+    return "completed", quest_data
 
-    return jsonify({"message": "Quest accepted successfully"}), 200
 
 @user_bp.route("/user/complete_quest", methods=["POST"])
 def complete_quest():
@@ -132,60 +277,51 @@ def complete_quest():
     quest_id = data.get("quest_id")
     user_id = data.get("user_id")
 
+    if not user_id or not quest_id:
+        return jsonify({"error": "Missing user_id or quest_id"}), 400
+
+    # One read of the quest and user plus one commit for every write
     quest_ref = db.collection("Quests").document(quest_id)
-    quest_doc = quest_ref.get()
+    user_ref = db.collection("Users").document(user_id)
+    outcome, quest_data = firestore.transactional(complete_quest_in)(db.transaction(), quest_ref, user_ref)
 
-    if not quest_doc.exists:
+    if outcome == "quest_not_found":
         return jsonify({"error": "Quest not found"}), 404
+    if outcome == "user_not_found":
+        return jsonify({"error": "User not found"}), 404
+    if outcome == "assigned_to_other":
+        return jsonify({"error": "Quest already assigned to another user"}), 409
 
-    quest_data = quest_doc.to_dict()
     reward = quest_data.get("reward_points", 0)
-    plant_id = quest_data.get("plant_id")
-    quest_type = quest_data.get("type")
-
-
-    quest_ref.update({
-        "status": "completed",
-        "proof_submission.timestamp": firestore.SERVER_TIMESTAMP,
-        "proof_submission.verified": True
-    })
+    if outcome == "already_completed":
+        # Quests completed before completed_by was recorded count as the caller's
+        if quest_data.get("completed_by", user_id) != user_id:
+            return jsonify({"error": "Quest already completed by another user"}), 409
+        return jsonify({
+            "message": f"🎉 Quest {quest_id} marked as completed and {reward} points awarded!",
+            "already_completed": True
+        }), 200
 
-
-    user_ref = db.collection("Users").document(user_id)
-    user_ref.update({
-        "quests_completed": firestore.ArrayUnion([quest_id]),
-        "eco_points": firestore.Increment(reward)
-    })
+    return jsonify({ "message": f"🎉 Quest {quest_id} marked as completed and {reward} points awarded!" }), 200
 
 
-    if plant_id:
-        plant_ref = db.collection("Plants").document(plant_id)
-        timestamp_field = None
+# 🏆 Leaderboard: global, or for the area around ?lat=&lng= (or a geohash ?area=)
+@user_bp.route("/leaderboard", methods=["GET"])
+def leaderboard():
+    area = request.args.get("area")
+    lat = request.args.get("lat", type=float)
+    lng = request.args.get("lng", type=float)
+    limit = request.args.get("limit", eco_points.LEADERBOARD_SIZE, type=int)
 
-        if quest_type == "Water Plant":
-            timestamp_field = "last_watered"
-        elif quest_type == "Health Assessment":
-            timestamp_field = "last_health_assessment"
-            generate_health_report.verify_image(image)
+    if lat is not None and lng is not None:
+        area = eco_points.area_of({"lat": lat, "lng": lng})
+    elif area:
+        # Boards are kept at one precision; longer geohashes name a point inside an area
+        if len(area) < eco_points.LEADERBOARD_AREA_PRECISION:
+            return jsonify({"error": f"area must be a geohash of at least {eco_points.LEADERBOARD_AREA_PRECISION} characters"}), 400
+        area = area[:eco_points.LEADERBOARD_AREA_PRECISION]
 
-        if timestamp_field:
-            plant_ref.update({timestamp_field: firestore.SERVER_TIMESTAMP})
-    
-    
-    if plant_id:
-        try:
-            plant_ref.update({
-                "quests": firestore.ArrayRemove([quest_id])
-            })
-        except Exception as e:
-            print(f"Error removing quest {quest_id} from plant {plant_id}: {e}")
-
-    
-    try:
-        user_ref.update({
-            "active_quests": firestore.ArrayRemove([quest_id])
-        })
-    except Exception as e:
-        print(f"Error removing quest {quest_id} from user {user_id}'s active quests: {e}")
-
-    return jsonify({ "message": f"🎉 Quest {quest_id} marked as completed and {reward} points awarded!" }), 200
+    return jsonify({
+        "area": area,
+        "leaderboard": eco_points.get_leaderboard(area, max(1, min(limit, eco_points.LEADERBOARD_SIZE)))
+    })
@@ -0,0 +1,164 @@
+import multiprocessing
+import threading
+import time
+
+# Video verification in isolated worker processes.
+# OpenCV decoding is CPU-heavy and a malformed upload can hang or balloon in
+# memory, so each job runs in its own child process with a wall-clock limit
+# and (on POSIX) an address-space limit. A timed-out job is killed outright;
+# request threads only ever wait on a pipe. At most `max_workers` jobs decode
+# at once; the rest wait their turn and are counted as queued.
+
+
+class VideoVerificationError(Exception):
+    pass
+
+
+class VideoTimeoutError(VideoVerificationError):
+    pass
+
+
+class VideoMemoryError(VideoVerificationError):
+    pass
+
+
+def _limit_memory(memory_limit_mb):
+    try:
+        import resource
+    except ImportError:
+        # Windows: no rlimits, the wall-clock limit still applies
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _verify(conn, video_path, memory_limit_mb):
+    try:
+        if memory_limit_mb:
+            _limit_memory(memory_limit_mb)
+        import cv2
+        import check
+        try:
+            result = check.verify_video(video_path, keep_best=True)
+            if result["samples"] == 0 and result["expected_samples"]:
+                # Decoding that yields nothing is usually an allocation failure
+                # inside FFmpeg under the address-space limit
+                conn.send(("memory" if memory_limit_mb else "error", "No frames could be decoded"))
+                return
+            frame = None
+            if result["contains_plant"] and result["best_frame"] is not None:
+                frame = check.encode_jpeg(result["best_frame"])
+            conn.send(("ok", frame))
+        except MemoryError as e:
+            conn.send(("memory", str(e) or "out of memory"))
+        except cv2.error as e:
+            kind = "memory" if "Insufficient memory" in str(e) else "error"
+            conn.send((kind, str(e)))
+        except Exception as e:
+            conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+
+class VideoVerifierPool:
+    def __init__(self, max_workers=2, timeout=60, memory_limit_mb=2048):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        methods = multiprocessing.get_all_start_methods()
+        # forkserver children fork from a clean helper process (no Flask or
+        # gRPC threads) with check/cv2 preloaded; spawn elsewhere
+        if "forkserver" in methods:
+            self._ctx = multiprocessing.get_context("forkserver")
+            self._ctx.set_forkserver_preload(["check"])
+        else:
+            self._ctx = multiprocessing.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+        self._counters = {
+            "queued": 0, "running": 0, "completed": 0,
+            "timeouts": 0, "memory_errors": 0, "failures": 0,
+        }
+        self._durations = []
+
+    def warm_up(self):
+        """Start the forkserver now rather than on the first video."""
+        # Never from inside a worker: it would start a forkserver of its own
+        if self._ctx.get_start_method() == "forkserver" and multiprocessing.parent_process() is None:
+            from multiprocessing import forkserver
+            forkserver.ensure_running()
+
+    def best_plant_frame(self, video_path):
+        """JPEG bytes of the best plant frame, or None if the video shows no plant.
+
+        Raises VideoTimeoutError / VideoMemoryError when the job exceeds its
+        limits and VideoVerificationError if the worker fails.
+        """
+        with self._lock:
+            self._counters["queued"] += 1
+        self._slots.acquire()
+        with self._lock:
+            self._counters["queued"] -= 1
+            self._counters["running"] += 1
+        started = time.monotonic()
+        outcome = "failures"
+        try:
+            frame = self._run(video_path)
+            outcome = "completed"
+            return frame
+        except VideoTimeoutError:
+            outcome = "timeouts"
+            raise
+        except VideoMemoryError:
+            outcome = "memory_errors"
+            raise
+        finally:
+            duration = time.monotonic() - started
+            self._slots.release()
+            with self._lock:
+                self._counters["running"] -= 1
+                self._counters[outcome] += 1
+                self._durations.append(duration)
+                del self._durations[:-100]
+
+    def _run(self, video_path):
+        parent_conn, child_conn = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(target=_verify, args=(child_conn, video_path, self.memory_limit_mb), daemon=True)
+        process.start()
+        child_conn.close()
+        try:
+            if not parent_conn.poll(self.timeout):
+                raise VideoTimeoutError(f"Video verification exceeded {self.timeout}s")
+            try:
+                kind, value = parent_conn.recv()
+            except EOFError:
+                # The child died without answering (e.g. killed by the OOM killer)
+                process.join()
+                raise VideoVerificationError(f"Video worker exited with code {process.exitcode}")
+        finally:
+            parent_conn.close()
+            if process.is_alive():
+                process.kill()
+            process.join()
+
+        if kind == "ok":
+            return value
+        if kind == "memory":
+            raise VideoMemoryError(f"Video verification exceeded {self.memory_limit_mb} MB: {value}")
+        raise VideoVerificationError(value)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            last = self._durations[-1] if self._durations else None
+            durations = sorted(self._durations)
+        return {
+            **counters,
+            "max_workers": self.max_workers,
+            "timeout_seconds": self.timeout,
+            "memory_limit_mb": self.memory_limit_mb,
+            "recent_jobs": len(durations),
+            "avg_duration_seconds": round(sum(durations) / len(durations), 3) if durations else None,
+            "p95_duration_seconds": round(durations[int(0.95 * (len(durations) - 1))], 3) if durations else None,
+            "last_duration_seconds": round(last, 3) if last is not None else None,
+        }